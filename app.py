@@ -9,24 +9,27 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from pathlib import Path
+import os
 import sys
+import uuid
 
 # Add notebooks directory to path
 sys.path.append(str(Path(__file__).parent / "notebooks"))
 
-# Import RAG system
-try:
-    import importlib.util
-    spec = importlib.util.spec_from_file_location(
-        "rag_system",
-        Path(__file__).parent / "notebooks" / "05_rag_system.py"
-    )
-    rag_module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(rag_module)
-    RAGChatbotWithGoogle = rag_module.RAGChatbotWithGoogle
-except Exception as e:
-    st.error(f"❌ Could not load RAG system: {e}")
-    RAGChatbotWithGoogle = None
+# Import RAG system (skipped in thin-client mode so the UI never loads torch/FAISS)
+RAGChatbotWithGoogle = None
+if not os.getenv("RAG_API_URL"):
+    try:
+        import importlib.util
+        spec = importlib.util.spec_from_file_location(
+            "rag_system",
+            Path(__file__).parent / "notebooks" / "05_rag_system.py"
+        )
+        rag_module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(rag_module)
+        RAGChatbotWithGoogle = rag_module.RAGChatbotWithGoogle
+    except Exception as e:
+        st.error(f"❌ Could not load RAG system: {e}")
 
 # ============================================================================
 # PAGE CONFIG
@@ -48,18 +51,43 @@ def initialize_session_state():
         st.session_state.rag_system = None
     if "system_loaded" not in st.session_state:
         st.session_state.system_loaded = False
+    # Markdown of turns that scrolled out of the live window, built once per turn
+    if "archived_md" not in st.session_state:
+        st.session_state.archived_md = ""
+    if "archived_count" not in st.session_state:
+        st.session_state.archived_count = 0
+    # Conversation id: the RAG system keeps each session's last results for follow-ups
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
 
 initialize_session_state()
 
+# Messages rendered as chat bubbles; older ones collapse into one cached block
+LIVE_MESSAGES = 6
+# Programs per page in the detailed results panel
+RESULTS_PAGE_SIZE = 5
+
 DATA_FILE = "./data/processed/universities_data.csv"
 EMBEDDINGS_FILE = "./data/processed/embeddings.pkl"
-FAISS_INDEX_FILE = "./data/processed/faiss_index.bin"
+# A shards directory (03_faiss_index.py --shards N) can be used in place of the .bin file
+FAISS_INDEX_FILE = os.getenv("RAG_INDEX_PATH", "./data/processed/faiss_index.bin")
+
+# When set, the UI is a thin client of notebooks/06_serve_api.py instead of loading the model itself
+RAG_API_URL = os.getenv("RAG_API_URL")
 
 
 @st.cache_resource
 def load_rag_system():
-    """Load RAG system"""
+    """Load RAG system (or connect to the retrieval service)"""
     try:
+        if RAG_API_URL:
+            from rag_client import RemoteRAGClient
+            client = RemoteRAGClient(RAG_API_URL)
+            if not client.is_ready():
+                st.error(f"❌ Retrieval service not ready: {RAG_API_URL}")
+                return None
+            return client
+        
         required = {
             "Data": DATA_FILE,
             "Embeddings": EMBEDDINGS_FILE,
@@ -319,6 +347,62 @@ else:
     """, unsafe_allow_html=True)
 
 
+# ============================================================================
+# CHAT RENDERING HELPERS
+# ============================================================================
+def _fmt_number(value, fmt: str) -> str:
+    """Format a positive number, 'N/A' for missing / zero / non-numeric"""
+    try:
+        v = float(value) if value else 0
+        return fmt.format(v) if v > 0 else "N/A"
+    except (TypeError, ValueError):
+        return "N/A"
+
+
+def compact_results(programs: pd.DataFrame) -> list:
+    """Per-turn record of the retrieved programs: plain dicts with display fields only"""
+    if programs is None or len(programs) == 0:
+        return []
+    cols = ['program', 'university_name', 'fees', 'duration', 'ielts', 'toefl']
+    records = programs.reindex(columns=cols).to_dict(orient='records')
+    return [{c: (None if pd.isna(v) else v) for c, v in r.items()} for r in records]
+
+
+def results_markdown(results: list, start: int) -> str:
+    """One markdown block for a page of programs (instead of 4 metric widgets each)"""
+    blocks = []
+    for i, r in enumerate(results, start + 1):
+        blocks.append(
+            f"### {i}. {r.get('program') or 'N/A'}\n"
+            f"**🏛️ University:** {r.get('university_name') or 'N/A'}\n\n"
+            f"💰 **Fees:** {_fmt_number(r.get('fees'), '${:,.0f}')} &nbsp;·&nbsp; "
+            f"⏱️ **Duration:** {r.get('duration') or 'N/A'} &nbsp;·&nbsp; "
+            f"📝 **IELTS:** {_fmt_number(r.get('ielts'), '{}')} &nbsp;·&nbsp; "
+            f"📝 **TOEFL:** {_fmt_number(r.get('toefl'), '{}')}"
+        )
+    return "\n\n---\n\n".join(blocks)
+
+
+def render_results(results: list, key: str):
+    """Detailed results, built only when the toggle is on, one page at a time"""
+    if not st.toggle(f" View {len(results)} Detailed Results", key=f"details_{key}"):
+        return
+    pages = max(1, -(-len(results) // RESULTS_PAGE_SIZE))
+    page = 1
+    if pages > 1:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, key=f"page_{key}")
+    start = (page - 1) * RESULTS_PAGE_SIZE
+    st.markdown(results_markdown(results[start:start + RESULTS_PAGE_SIZE], start))
+
+
+def archive_messages(messages: list):
+    """Append messages older than the live window to the pre-rendered archive markdown"""
+    while st.session_state.archived_count < len(messages) - LIVE_MESSAGES:
+        msg = messages[st.session_state.archived_count]
+        who = "**👤 You:**" if msg["role"] == "user" else "**🤖 Assistant:**"
+        st.session_state.archived_md += f"{who}\n\n{msg['content']}\n\n---\n\n"
+        st.session_state.archived_count += 1
+
 with st.sidebar:
     st.markdown("### ⚙️ Control Panel")
     
@@ -335,13 +419,39 @@ with st.sidebar:
         st.success("AI Assistant Active")
         with st.expander("System Stats"):
             try:
-                st.metric("Total Programs", len(st.session_state.rag_system.data))
-                st.metric("Vector Index", f"{st.session_state.rag_system.index.ntotal:,}")
-                st.metric("AI Model", "MiniLM-L6")
-                llm = "Gemini 2.0 ⚡" if st.session_state.rag_system.llm else "Basic Mode"
+                stats = st.session_state.rag_system.stats()
+                st.metric("Total Programs", stats['programs'])
+                st.metric("Vector Index", f"{stats['vectors']:,}")
+                st.metric("AI Model", "MiniLM-L6 (shared)" if stats.get('encoder', 'local') != 'local' else "MiniLM-L6")
+                llm_names = {"gemini": "Gemini 2.0 ⚡", "openai": "OpenAI ⚡", "stub": "Local Stub"}
+                llm = llm_names.get(stats.get('llm_provider'), "Gemini 2.0 ⚡") if stats['llm'] else "Basic Mode"
                 st.metric("Language Model", llm)
+                runtime = stats.get('runtime') or {}
+                if runtime:
+                    st.caption(
+                        f"🧵 torch threads: {runtime.get('torch_threads', '-')} · "
+                        f"FAISS OMP: {runtime.get('faiss_omp_threads', '-')} · "
+                        f"RSS: {runtime.get('rss_mb', '-')} MB"
+                    )
             except:
                 pass
+            
+            # Opt-in profiling of the next N requests (in-process model only)
+            profiler = getattr(st.session_state.rag_system, 'profiler', None)
+            if profiler is not None:
+                status = profiler.status()
+                if status['active']:
+                    st.info(f"🔬 Profiling: {status['remaining']} requests left → {status['run_dir']}")
+                    if st.button("⏹️ Stop profiling", key="profile_stop", use_container_width=True):
+                        profiler.stop()
+                        st.rerun()
+                else:
+                    n_profile = st.number_input("Requests to profile", 1, 500, 20, key="profile_requests")
+                    if st.button("🔬 Start profiling", key="profile_start", use_container_width=True):
+                        profiler.start(int(n_profile))
+                        st.rerun()
+                    if status['last_run']:
+                        st.caption(f"Last profile: {status['last_run']}")
     
     st.divider()
     
@@ -370,6 +480,9 @@ with st.sidebar:
     
     if st.button("🗑️ Clear Chat", use_container_width=True):
         st.session_state.messages = []
+        st.session_state.archived_md = ""
+        st.session_state.archived_count = 0
+        st.session_state.session_id = uuid.uuid4().hex
         st.rerun()
     
     st.divider()
@@ -407,13 +520,44 @@ if not st.session_state.system_loaded:
         """, unsafe_allow_html=True)
 
 else:
-    # Display chat history
-    for msg in st.session_state.messages:
+    # Fold turns that left the live window into the cached archive (each message once)
+    archive_messages(st.session_state.messages)
+    
+    if st.session_state.archived_count:
+        with st.expander(f"🕘 Earlier conversation ({st.session_state.archived_count} messages)"):
+            st.markdown(st.session_state.archived_md)
+    
+    # Display recent chat history
+    for i in range(st.session_state.archived_count, len(st.session_state.messages)):
+        msg = st.session_state.messages[i]
         with st.chat_message(msg["role"], avatar="👤" if msg["role"] == "user" else "🤖"):
             st.markdown(msg["content"])
-    
-    # Chat input
-    if user_input := st.chat_input("💬 Ask me anything about studying abroad..."):
+            if msg.get("results"):
+                render_results(msg["results"], key=f"msg_{i}")
+    
+    # Typeahead: fix long / misspelled names before spending a full search + LLM round trip
+    lookup = st.text_input(
+        "🔎 Find a program or university",
+        key="typeahead",
+        placeholder="Start typing a name, e.g. aalim muhammed...",
+        label_visibility="collapsed"
+    )
+    if lookup:
+        suggestions = st.session_state.rag_system.suggest(lookup, n=5)
+        if suggestions:
+            cols = st.columns(len(suggestions))
+            for col, (j, sug) in zip(cols, enumerate(suggestions)):
+                icon = "🏛️" if sug['type'] == 'university' else "🎓"
+                if col.button(f"{icon} {sug['text'][:40]}", key=f"sug_{j}_{sug['text']}", help=sug['text']):
+                    st.session_state.pending_query = sug['text']
+                    st.rerun()
+        else:
+            st.caption("No matching names")
+    
+    # Chat input (or a picked suggestion)
+    user_input = st.chat_input("💬 Ask me anything about studying abroad...") \
+        or st.session_state.pop("pending_query", None)
+    if user_input:
         # Add user message
         st.session_state.messages.append({"role": "user", "content": user_input})
         with st.chat_message("user", avatar="👤"):
@@ -425,7 +569,10 @@ else:
                 with st.spinner("Analyzing your query..."):
                     
                     # Call RAG system
-                    result = st.session_state.rag_system.answer(user_input, k=k)
+                    result = st.session_state.rag_system.answer(
+                        user_input, k=k, session=st.session_state.session_id
+                    )
+                    results = None
                     
                     if result['count'] == 0:
                         response = "Sorry, I couldn't find any matching programs. Try rephrasing your query or being more specific."
@@ -435,54 +582,16 @@ else:
                         response = result['response']
                         st.markdown(response)
                         
-                        # Show detailed results
-                        with st.expander(f" View {result['count']} Detailed Results"):
-                            programs = result['programs']
-                            
-                            for i, (idx, row) in enumerate(programs.iterrows(), 1):
-                                st.markdown(f"### {i}. {row.get('program', 'N/A')}")
-                                st.markdown(f"**🏛️ University:** {row.get('university_name', 'N/A')}")
-                                
-                                cols = st.columns(4)
-                                
-                                # Fees
-                                fees = row.get('fees', 0)
-                                try:
-                                    f = float(fees) if fees else 0
-                                    cols[0].metric("💰 Fees", f"${f:,.0f}" if f > 0 else "N/A")
-                                except:
-                                    cols[0].metric("💰 Fees", "N/A")
-                                
-                                # Duration
-                                cols[1].metric("⏱️ Duration", str(row.get('duration', 'N/A')))
-                                
-                                # IELTS
-                                ielts = row.get('ielts', 0)
-                                try:
-                                    ie = float(ielts) if ielts else 0
-                                    cols[2].metric("📝 IELTS", f"{ie}" if ie > 0 else "N/A")
-                                except:
-                                    cols[2].metric("📝 IELTS", "N/A")
-                                
-                                # TOEFL
-                                toefl = row.get('toefl', 0)
-                                try:
-                                    tf = float(toefl) if toefl else 0
-                                    cols[3].metric("📝 TOEFL", f"{tf}" if tf > 0 else "N/A")
-                                except:
-                                    cols[3].metric("📝 TOEFL", "N/A")
-                               
-                                
-                                if i < len(programs):
-                                    st.divider()
+                        # Keep only the fields the results panel shows, not the DataFrame
+                        results = compact_results(result['programs'])
+                        render_results(results, key=f"msg_{len(st.session_state.messages)}")
                     
                     # Save to history
-                    st.session_state.messages.append({"role": "assistant", "content": response})
+                    st.session_state.messages.append({"role": "assistant", "content": response, "results": results})
                     
             except Exception as e:
                 err = f"❌ Oops! Something went wrong: {str(e)}"
                 st.error(err)
                 st.session_state.messages.append({"role": "assistant", "content": err})
 
-
 st.divider()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SCRIPT 1: STREAMING DATA PREPROCESSING
+Scriptable version of 01_data_preprocessing.ipynb that runs in constant
+memory, so refreshes from much larger scrapes work the same way.
+
+Sources (both required; a catalogue from one source would silently stop
+matching the committed embeddings / index):
+    --colleges   college_data.csv style scrape (fees like "Rs 8,76,186/-")
+    --programs   all_programs.xlsx/.csv style export (price x duration)
+
+Pipeline:
+    1. Read each source in chunks
+    2. Clean chunks in parallel worker processes with vectorized regex
+       parsing (fees + currency, duration, ranking)
+    3. Optionally (--dedupe) drop duplicates across chunks by hashing the
+       merge keys (only 8 bytes per kept row stay in memory). Off by
+       default, like the notebook's outer merge.
+    4. Stream the chunks into a Parquet staging file, tracking IELTS/TOEFL
+       sums for the mean fill
+    5. Second pass over the staging file row group by row group: fill the
+       means and write the catalogue as Parquet + universities_data.csv
+
+universities_data.csv has exactly the notebook's columns and fills
+(course_languageEn / college_link 'not specified', gpa 0.0, IELTS/TOEFL
+means); catalogue.parquet also keeps the parsed duration_years and rank.
+
+Output: ./data/processed/refresh/{catalogue.parquet, universities_data.csv}
+        (never the live ./data/processed/universities_data.csv; review
+        it, then copy it over and re-run steps 2-3)
+
+Usage:
+    python notebooks/01_data_preprocessing.py --colleges data/college_data.csv \
+        --programs data/all_programs.xlsx --workers 4
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from followups import parse_duration_years
+
+# USD per unit of currency; the notebook used 83 INR = 1 USD
+USD_RATES = {'USD': 1.0, 'INR': 1 / 83, 'EUR': 1.08, 'GBP': 1.27}
+
+CATALOGUE_SCHEMA = pa.schema([
+    ('program', pa.string()),
+    ('course_languageEn', pa.string()),
+    ('duration', pa.string()),
+    ('university_name', pa.string()),
+    ('ielts', pa.float64()),
+    ('toefl', pa.float64()),
+    ('gpa', pa.float64()),
+    ('fees', pa.float64()),
+    ('college_link', pa.string()),
+    ('duration_years', pa.float64()),
+    ('rank', pa.float64()),
+])
+CATALOGUE_COLUMNS = CATALOGUE_SCHEMA.names
+# universities_data.csv as the notebook writes it
+CSV_COLUMNS = ['program', 'course_languageEn', 'duration', 'university_name',
+               'ielts', 'toefl', 'gpa', 'fees', 'college_link']
+REFRESH_DIR = './data/processed/refresh'
+MERGE_KEYS = ['university_name', 'program', 'fees', 'duration']
+MISSING = ["", " ", "NA", "None", "-"]
+
+
+# ============================================================================
+# VECTORIZED PARSERS
+# ============================================================================
+
+def parse_fees(raw: pd.Series, default_currency: str = 'INR') -> pd.Series:
+    """
+    Free-text fees -> USD.
+    Handles "Rs 8,76,186/-", "₹1.2 Lakh", "$12,000", "EUR 9k", "2 Cr" etc.
+    """
+    text = raw.astype('string').str.lower()
+    currency = np.select(
+        [
+            text.str.contains(r'rs\.?|inr|₹', regex=True, na=False),
+            text.str.contains(r'\$|usd', regex=True, na=False),
+            text.str.contains(r'€|eur', regex=True, na=False),
+            text.str.contains(r'£|gbp', regex=True, na=False),
+        ],
+        ['INR', 'USD', 'EUR', 'GBP'],
+        default=default_currency
+    )
+    multiplier = np.select(
+        [
+            text.str.contains(r'\bcr(?:ore)?s?\b', regex=True, na=False),
+            text.str.contains(r'\bla(?:kh|c)s?\b|\bl\b', regex=True, na=False),
+            text.str.contains(r'\d\s*k\b', regex=True, na=False),
+        ],
+        [1e7, 1e5, 1e3],
+        default=1.0
+    )
+    amount = pd.to_numeric(
+        text.str.replace(',', '', regex=False).str.extract(r'(\d+(?:\.\d+)?)', expand=False),
+        errors='coerce'
+    )
+    rates = pd.Series(currency).map(USD_RATES).to_numpy()
+    return (amount * multiplier * rates).round(2)
+
+
+def parse_rank(raw: pd.Series) -> pd.Series:
+    """"#12", "Rank 12/200", 12.0 -> 12.0"""
+    return pd.to_numeric(
+        raw.astype('string').str.extract(r'(\d+)', expand=False),
+        errors='coerce'
+    )
+
+
+def _normalize_text(series: pd.Series) -> pd.Series:
+    return series.astype('string').str.strip().str.lower()
+
+
+def _finalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Common column normalization so every chunk has the catalogue schema"""
+    for col in ['program', 'university_name', 'duration', 'course_languageEn']:
+        df[col] = _normalize_text(df[col])
+    df['course_languageEn'] = df['course_languageEn'].fillna('not specified')
+    df['gpa'] = pd.to_numeric(df['gpa'], errors='coerce').fillna(0.0)
+    df['college_link'] = df['college_link'].fillna('not specified')
+    for col in ['ielts', 'toefl', 'fees', 'duration_years', 'rank']:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    df = df.dropna(subset=['program', 'university_name', 'fees'])
+    return df[CATALOGUE_COLUMNS].reset_index(drop=True)
+
+
+# ============================================================================
+# CHUNK CLEANERS (run in worker processes)
+# ============================================================================
+
+def clean_college_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """college_data.csv: drop rows without program/fees, fees INR -> USD"""
+    chunk = chunk.copy()
+    chunk[['program', 'fees']] = chunk[['program', 'fees']].replace(MISSING, np.nan)
+    chunk = chunk.dropna(subset=['program', 'fees'])
+
+    return _finalize(pd.DataFrame({
+        'program': chunk['program'],
+        'course_languageEn': np.nan,
+        'duration': chunk['duration'],
+        'university_name': chunk['college_name'],
+        'ielts': np.nan,
+        'toefl': np.nan,
+        'gpa': np.nan,
+        'fees': parse_fees(chunk['fees'], default_currency='INR').to_numpy(),
+        'college_link': chunk['college_link'],
+        'duration_years': parse_duration_years(chunk['duration']).to_numpy(),
+        'rank': parse_rank(chunk['rank']).to_numpy() if 'rank' in chunk.columns else np.nan,
+    }))
+
+
+def clean_programs_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """all_programs export: drop rows without test scores, fees = price x duration"""
+    chunk = chunk.copy()
+    chunk[['ilts', 'toefl', 'gpa']] = chunk[['ilts', 'toefl', 'gpa']].replace(MISSING, np.nan)
+    chunk = chunk.dropna(subset=['ilts', 'toefl', 'gpa'])
+
+    years = parse_duration_years(chunk['course_durationEn'])
+    price = pd.to_numeric(chunk['price'], errors='coerce')
+    # Notebook: fees = price x the leading number of course_durationEn
+    leading = pd.to_numeric(
+        chunk['course_durationEn'].astype('string').str.extract(r'(\d+)', expand=False),
+        errors='coerce'
+    )
+
+    return _finalize(pd.DataFrame({
+        'program': chunk['nameEn'],
+        'course_languageEn': chunk['course_languageEn'],
+        'duration': chunk['course_durationEn'],
+        'university_name': chunk['university_name'],
+        'ielts': chunk['ilts'],
+        'toefl': chunk['toefl'],
+        'gpa': chunk['gpa'],
+        'fees': (price * leading).to_numpy(),
+        'college_link': np.nan,
+        'duration_years': years.to_numpy(),
+        'rank': np.nan,
+    }))
+
+
+# ============================================================================
+# STREAMING
+# ============================================================================
+
+def iter_chunks(path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Chunked reader; Excel has no streaming reader in pandas so it is sliced after loading"""
+    if path.endswith('.xlsx') or path.endswith('.xls'):
+        df = pd.read_excel(path)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=str)
+
+
+def parallel_map(fn: Callable, chunks: Iterator[pd.DataFrame], workers: int) -> Iterator[pd.DataFrame]:
+    """Ordered map over chunks with at most 2 x workers chunks in flight"""
+    if workers <= 1:
+        yield from map(fn, chunks)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = []
+        for chunk in chunks:
+            in_flight.append(pool.submit(fn, chunk))
+            if len(in_flight) >= 2 * workers:
+                yield in_flight.pop(0).result()
+        for future in in_flight:
+            yield future.result()
+
+
+def preprocess(colleges_path: Optional[str] = './data/college_data.csv',
+               programs_path: Optional[str] = None,
+               output_dir: str = REFRESH_DIR,
+               chunk_size: int = 2000,
+               workers: int = os.cpu_count() or 1,
+               dedupe: bool = False) -> Dict:
+    """Run the streaming cleaning pipeline and write the catalogue"""
+
+    print("\n" + "="*80)
+    print(" STEP 1: STREAMING DATA PREPROCESSING")
+    print("="*80 + "\n")
+
+    # Both sources or nothing: a partial catalogue would replace ~18k programs
+    # with one source's rows and no longer match the embeddings / index
+    for name, path in (('--colleges', colleges_path), ('--programs', programs_path)):
+        if not path:
+            raise ValueError(f"{name} is required; refusing to write a partial catalogue")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{name} source not found: {path}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    staging_path = os.path.join(output_dir, 'catalogue.staging.parquet')
+    parquet_path = os.path.join(output_dir, 'catalogue.parquet')
+    csv_path = os.path.join(output_dir, 'universities_data.csv')
+
+    # Same order as the notebook merge: programs first, then colleges
+    sources = [
+        (programs_path, clean_programs_chunk),
+        (colleges_path, clean_college_chunk),
+    ]
+
+    start = time.time()
+    seen = set()
+    totals = {'rows_in': 0, 'rows_out': 0, 'ielts_sum': 0.0, 'ielts_n': 0, 'toefl_sum': 0.0, 'toefl_n': 0}
+
+    # Pass 1: clean + dedupe into a staging file
+    with pq.ParquetWriter(staging_path, CATALOGUE_SCHEMA) as staging:
+        for path, cleaner in sources:
+            print(f"📚 Cleaning {path} ({workers} workers, {chunk_size:,} rows/chunk)")
+
+            def counted(chunks):
+                for chunk in chunks:
+                    totals['rows_in'] += len(chunk)
+                    yield chunk
+
+            for cleaned in parallel_map(cleaner, counted(iter_chunks(path, chunk_size)), workers):
+                if dedupe:
+                    keys = pd.util.hash_pandas_object(cleaned[MERGE_KEYS], index=False).to_numpy()
+                    fresh = np.array([key not in seen for key in keys], dtype=bool)
+                    # Also drop duplicates inside the chunk itself
+                    fresh &= ~pd.Series(keys).duplicated().to_numpy()
+                    seen.update(keys[fresh].tolist())
+                    cleaned = cleaned[fresh]
+                if cleaned.empty:
+                    continue
+
+                for col in ['ielts', 'toefl']:
+                    totals[f'{col}_sum'] += float(cleaned[col].sum())
+                    totals[f'{col}_n'] += int(cleaned[col].notna().sum())
+                totals['rows_out'] += len(cleaned)
+                staging.write_table(pa.Table.from_pandas(cleaned, schema=CATALOGUE_SCHEMA, preserve_index=False))
+
+    # Pass 2: mean-fill test scores and write the final catalogue
+    fill = {
+        col: totals[f'{col}_sum'] / totals[f'{col}_n'] if totals[f'{col}_n'] else np.nan
+        for col in ['ielts', 'toefl']
+    }
+    print(f"🔧 Filling missing scores with means: IELTS {fill['ielts']:.2f}, TOEFL {fill['toefl']:.2f}")
+
+    header = True
+    with pq.ParquetWriter(parquet_path, CATALOGUE_SCHEMA) as catalogue:
+        for batch in pq.ParquetFile(staging_path).iter_batches():
+            df = batch.to_pandas().fillna(fill)
+            catalogue.write_table(pa.Table.from_pandas(df, schema=CATALOGUE_SCHEMA, preserve_index=False))
+            df[CSV_COLUMNS].to_csv(csv_path, mode='w' if header else 'a', header=header, index=False)
+            header = False
+    os.remove(staging_path)
+
+    elapsed = time.time() - start
+    print(f"✅ {totals['rows_in']:,} rows in -> {totals['rows_out']:,} programs in {elapsed:.1f}s "
+          f"({totals['rows_in'] / max(elapsed, 1e-9):,.0f} rows/s)")
+    print(f"   Parquet: {parquet_path}")
+    print(f"   CSV:     {csv_path}")
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean raw college/program scrapes into the catalogue")
+    parser.add_argument("--colleges", default='./data/college_data.csv')
+    parser.add_argument("--programs", required=True, help="all_programs.xlsx or .csv export")
+    parser.add_argument("--output-dir", default=REFRESH_DIR)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--dedupe", action="store_true", help="drop rows repeating the merge keys")
+    args = parser.parse_args()
+
+    if os.path.abspath(args.output_dir) == os.path.abspath('./data/processed'):
+        parser.error("--output-dir must not be the live ./data/processed; write elsewhere and copy it over")
+
+    preprocess(args.colleges, args.programs, args.output_dir, args.chunk_size, args.workers,
+               dedupe=args.dedupe)
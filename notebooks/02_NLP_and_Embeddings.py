@@ -9,7 +9,8 @@ def create_embeddings(data_path: str, output_dir: str = './data/processed'):
     """
     Create embeddings for all programs
     
-    Input: ./data/all_programs_cleaned.xlsx
+    Input: ./data/all_programs_cleaned.xlsx (or the .csv/.parquet catalogue
+           written by 01_data_preprocessing.py)
     Output: ./data/processed/embeddings.pkl
     """
     
@@ -19,7 +20,12 @@ def create_embeddings(data_path: str, output_dir: str = './data/processed'):
     
     # Load data
     print(f"Loading data from: {data_path}")
-    data = pd.read_excel(data_path)
+    if data_path.endswith('.parquet'):
+        data = pd.read_parquet(data_path)
+    elif data_path.endswith('.csv'):
+        data = pd.read_csv(data_path)
+    else:
+        data = pd.read_excel(data_path)
     print(f"Loaded: {len(data)} records")
     
     # Initialize model
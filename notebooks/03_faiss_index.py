@@ -1,48 +1,222 @@
-
 import pandas as pd
 import numpy as np
 import pickle
 import faiss
 import os
 
-def build_faiss_index(embeddings_path: str, output_dir: str = './data/processed'):
+from facets import FacetIndex
+
+# Bytes per vector for d=384: flat 1536, fp16 768, int8 384, pq (m=48) 48
+STORAGE_MODES = ('flat', 'fp16', 'int8', 'pq')
+
+
+def make_index(dimension: int, storage: str = 'flat', pq_m: int = 48, pq_bits: int = 8):
+    """
+    Create an (untrained) FAISS index for a storage mode
+    flat  - float32, exact
+    fp16  - float16 scalar quantizer
+    int8  - 8-bit scalar quantizer (per-dimension min/max)
+    pq    - product quantization, pq_m sub-vectors of pq_bits each
+    """
+    if storage == 'flat':
+        return faiss.IndexFlatL2(dimension)
+    if storage == 'fp16':
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    if storage == 'int8':
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+    if storage == 'pq':
+        return faiss.IndexPQ(dimension, pq_m, pq_bits, faiss.METRIC_L2)
+    raise ValueError(f"Unknown storage mode '{storage}', expected one of {STORAGE_MODES}")
+
+
+def train(index, embeddings: np.ndarray, train_size: int = 100_000):
+    """Train on a sample (quantizers only; flat indexes are always trained)"""
+    if not index.is_trained:
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(embeddings), size=min(train_size, len(embeddings)), replace=False)
+        index.train(np.ascontiguousarray(embeddings[np.sort(sample)], dtype='float32'))
+    return index
+
+
+def train_and_add(index, embeddings: np.ndarray, train_size: int = 100_000, add_batch: int = 65_536):
+    """Train on a sample (quantizers only) and add vectors in batches"""
+    train(index, embeddings, train_size)
+    for start in range(0, len(embeddings), add_batch):
+        index.add(np.ascontiguousarray(embeddings[start:start + add_batch], dtype='float32'))
+    return index
+
+
+def build_faiss_index(embeddings_path: str, output_dir: str = './data/processed',
+                      storage: str = 'flat', pq_m: int = 48):
     """
     Build FAISS index from embeddings
-    
+
     Input: ./data/processed/embeddings.pkl
     Output: ./data/processed/faiss_index.bin
+            ./data/processed/embeddings.npy (float32, memory-mapped by the
+            RAG system to re-rank candidates from compressed indexes)
     """
-    
+
     print("\n" + "="*80)
     print(" STEP 3: BUILD FAISS INDEX")
     print("="*80 + "\n")
-    
+
     # Load embeddings
     print(f" Loading embeddings from: {embeddings_path}")
     with open(embeddings_path, 'rb') as f:
         embeddings = pickle.load(f)
     print(f" Loaded: shape {embeddings.shape}")
-    
+
     # Create FAISS index
-    print("\n Building FAISS index...")
+    print(f"\n Building FAISS index (storage: {storage})...")
     dimension = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    
+    index = make_index(dimension, storage, pq_m=pq_m)
+
     # Convert to float32
     embeddings_f32 = embeddings.astype('float32')
-    index.add(embeddings_f32)
-    
+    train_and_add(index, embeddings_f32)
+
     print(f" Index created with {index.ntotal} vectors")
-    
+    print(f"   Size: {len(faiss.serialize_index(index)) / 1e6:.1f} MB "
+          f"(float32 would be {embeddings_f32.nbytes / 1e6:.1f} MB)")
+
     # Save index
     index_file = f"{output_dir}/faiss_index.bin"
     print(f"\n Saving index to: {index_file}")
     os.makedirs(output_dir, exist_ok=True)
-    
+
     faiss.write_index(index, index_file)
+
+    # Raw float32 matrix for exact re-ranking (opened with mmap, never fully loaded)
+    np.save(f"{output_dir}/embeddings.npy", embeddings_f32)
     print(" Saved successfully!")
-    
+
     return index
 
+
+def build_facets(data_path: str, output_dir: str = './data/processed'):
+    """
+    Precompute the catalogue-wide facet arrays (see facets.py)
+
+    Input: ./data/processed/universities_data.csv
+    Output: ./data/processed/facets.npz
+    """
+
+    print("\n Building faceted aggregates...")
+    try:
+        data = pd.read_csv(data_path, encoding='utf-8')
+    except UnicodeDecodeError:
+        data = pd.read_csv(data_path, encoding='latin-1')
+    facets = FacetIndex.build(data)
+
+    facets_file = f"{output_dir}/facets.npz"
+    os.makedirs(output_dir, exist_ok=True)
+    facets.save(facets_file)
+    print(f" {len(facets.g_count)} family/level groups, {len(facets.u_count)} university groups "
+          f"-> {facets_file} ({os.path.getsize(facets_file) / 1e6:.1f} MB)")
+    return facets
+
+
+def build_sharded_index(embeddings_path: str, output_dir: str = './data/processed/shards',
+                        num_shards: int = 4, partition_by: str = 'range',
+                        data_path: str = './data/processed/universities_data.csv',
+                        storage: str = 'flat', pq_m: int = 48):
+    """
+    Build one FAISS index per shard for scatter-gather search (see sharding.py)
+
+    partition_by='range'  - contiguous global id ranges, num_shards of them
+    partition_by=<column> - one shard per value of that data column; meant for
+                            future catalogues with e.g. a 'country' column (the
+                            current universities_data.csv has none)
+
+    Quantized storage (fp16 / int8 / PQ) is trained once on a sample of the
+    whole matrix and copied into every shard, so small partitions (PQ needs at
+    least 2^bits training points) work and approximate distances are
+    comparable across shards.
+
+    Output: <output_dir>/manifest.json
+            <output_dir>/shard-XXX/{faiss_index.bin, ids.npy, manifest.json}
+            embeddings.npy next to embeddings_path (float32, memory-mapped by
+            the coordinator for exact re-ranking instead of unpickling)
+    ids.npy maps each shard-local row back to its global row id.
+    """
+    import json
+
+    print("\n" + "="*80)
+    print(f" STEP 3: BUILD SHARDED FAISS INDEX (by {partition_by})")
+    print("="*80 + "\n")
+
+    with open(embeddings_path, 'rb') as f:
+        embeddings = pickle.load(f).astype('float32')
+    dimension = embeddings.shape[1]
+
+    if partition_by == 'range':
+        bounds = np.linspace(0, len(embeddings), num_shards + 1).astype('int64')
+        groups = [(f"{lo}-{hi}", np.arange(lo, hi, dtype='int64')) for lo, hi in zip(bounds[:-1], bounds[1:])]
+    else:
+        columns = pd.read_csv(data_path, nrows=0).columns
+        if partition_by not in columns:
+            raise ValueError(f"Cannot partition by '{partition_by}': {data_path} has no such column "
+                             f"(columns: {', '.join(columns)})")
+        keys = pd.read_csv(data_path, usecols=[partition_by])[partition_by].fillna('unknown').astype(str)
+        groups = [(key, np.asarray(ids, dtype='int64')) for key, ids in keys.groupby(keys).indices.items()]
+
+    # One trained (empty) quantizer shared by every shard
+    template = train(make_index(dimension, storage, pq_m=pq_m), embeddings)
+
+    os.makedirs(output_dir, exist_ok=True)
+    shards = []
+    for shard_id, (key, ids) in enumerate(groups):
+        shard_dir = os.path.join(output_dir, f"shard-{shard_id:03d}")
+        os.makedirs(shard_dir, exist_ok=True)
+
+        index = train_and_add(faiss.clone_index(template), embeddings[ids])
+        faiss.write_index(index, os.path.join(shard_dir, "faiss_index.bin"))
+        np.save(os.path.join(shard_dir, "ids.npy"), ids)
+
+        manifest = {
+            'shard': shard_id,
+            'key': key,
+            'count': int(len(ids)),
+            'dimension': dimension,
+            'storage': storage,
+            'index': "faiss_index.bin",
+            'ids': "ids.npy"
+        }
+        with open(os.path.join(shard_dir, "manifest.json"), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        shards.append({'path': os.path.basename(shard_dir), 'key': key, 'count': int(len(ids)), 'address': None})
+        print(f"   shard-{shard_id:03d} [{key}]: {len(ids):,} vectors")
+
+    with open(os.path.join(output_dir, "manifest.json"), 'w') as f:
+        json.dump({
+            'dimension': dimension,
+            'storage': storage,
+            'partition_by': partition_by,
+            'ntotal': int(len(embeddings)),
+            'shards': shards
+        }, f, indent=2)
+
+    # Raw float32 matrix for exact re-ranking on the coordinator
+    npy_path = os.path.splitext(embeddings_path)[0] + '.npy'
+    np.save(npy_path, embeddings)
+
+    print(f"\n Saved {len(shards)} shards to: {output_dir} (re-rank matrix: {npy_path})")
+    return shards
+
+
 if __name__ == "__main__":
-    build_faiss_index('./data/processed/embeddings.pkl')
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the FAISS index (single or sharded)")
+    parser.add_argument("storage", nargs="?", default='flat', choices=STORAGE_MODES)
+    parser.add_argument("--shards", type=int, default=0, help="build a sharded index with this many id-range shards")
+    parser.add_argument("--partition-by", default='range',
+                        help="'range' or a data column (e.g. 'country' in future catalogues)")
+    args = parser.parse_args()
+
+    if args.shards or args.partition_by != 'range':
+        build_sharded_index('./data/processed/embeddings.pkl', num_shards=max(args.shards, 1),
+                            partition_by=args.partition_by, storage=args.storage)
+    else:
+        build_faiss_index('./data/processed/embeddings.pkl', storage=args.storage)
+    build_facets('./data/processed/universities_data.csv')
@@ -7,15 +7,23 @@ FINAL WORKING VERSION - All bugs fixed + Encoding fixed
 
 import pandas as pd
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import faiss
 import pickle
-from typing import Dict
-from langchain_core.prompts import PromptTemplate
-import google.generativeai as genai
 import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from langchain_core.prompts import PromptTemplate
 from dotenv import load_dotenv
 
+from autocomplete import AutocompleteIndex
+from facets import FacetIndex, catalogue_fingerprint
+from followups import content_words, is_followup, parse_duration_years, parse_ordinals, parse_refinement
+from llm_client import LLMError, build_llm_from_env
+from profiling import Profiler, runtime_info
+from shared_serving import MMAP_FLAGS, EncoderClient, attach_shared
+from sharding import ShardedIndex, is_sharded
+
 load_dotenv()
 
 
@@ -29,54 +37,124 @@ class RAGChatbotWithGoogle:
         print("🤖 STEP 5: INITIALIZING RAG SYSTEM")
         print("="*80 + "\n")
         
-        # Load data with encoding fix
-        print("📚 Loading data...")
-        try:
-            # Try UTF-8 first
-            self.data = pd.read_csv(data_path, encoding='utf-8')
-        except UnicodeDecodeError:
+        # Shared mode: map the files written by `shared_serving.py export`
+        # read-only, so every Streamlit worker process uses the same pages
+        self.shared_dir = os.getenv('RAG_SHARED_DIR')
+        if self.shared_dir:
+            print(f"🔗 Attaching to shared files in {self.shared_dir}...")
+            self.data, self.embeddings, index_path = attach_shared(self.shared_dir)
+            print(f"✅ Data attached: {len(self.data)} records, embeddings {self.embeddings.shape}")
+        else:
+            # Load data with encoding fix
+            print("📚 Loading data...")
             try:
-                # Try Latin-1
-                self.data = pd.read_csv(data_path, encoding='latin-1')
-            except:
-                # Last resort: read Excel
-                print("⚠️ CSV encoding issue, trying Excel...")
-                self.data = pd.read_excel(data_path.replace('.csv', '.xlsx'))
+                # Try UTF-8 first
+                self.data = pd.read_csv(data_path, encoding='utf-8')
+            except UnicodeDecodeError:
+                try:
+                    # Try Latin-1
+                    self.data = pd.read_csv(data_path, encoding='latin-1')
+                except:
+                    # Last resort: read Excel
+                    print("⚠️ CSV encoding issue, trying Excel...")
+                    self.data = pd.read_excel(data_path.replace('.csv', '.xlsx'))
+            
+            print(f"✅ Data loaded: {len(self.data)} records")
+            
+            # Load embeddings (memory-mapped .npy when 03_faiss_index.py wrote one,
+            # so only the rows touched by re-ranking are ever paged in)
+            print("📊 Loading embeddings...")
+            npy_path = os.path.splitext(embeddings_path)[0] + '.npy'
+            if os.path.exists(npy_path):
+                self.embeddings = np.load(npy_path, mmap_mode='r')
+            else:
+                with open(embeddings_path, 'rb') as f:
+                    self.embeddings = pickle.load(f)
+            print(f"✅ Embeddings loaded: shape {self.embeddings.shape}")
         
-        print(f"✅ Data loaded: {len(self.data)} records")
+        # Load FAISS index (a directory with manifest.json means a sharded index)
+        print("⚡ Loading FAISS index...")
+        if is_sharded(index_path):
+            self.index = ShardedIndex(index_path, timeout=float(os.getenv('RAG_SHARD_TIMEOUT_S', '2')))
+            print(f"✅ Sharded index: {len(self.index.clients)} shards, {self.index.ntotal} vectors")
+        else:
+            self.index = faiss.read_index(index_path, MMAP_FLAGS if self.shared_dir else 0)
+            print(f"✅ Index loaded: {self.index.ntotal} vectors")
         
-        # Load embeddings
-        print("📊 Loading embeddings...")
-        with open(embeddings_path, 'rb') as f:
-            self.embeddings = pickle.load(f)
-        print(f"✅ Embeddings loaded: shape {self.embeddings.shape}")
+        # Compressed indexes (fp16 / int8 / PQ) return approximate distances:
+        # fetch rerank_factor x k candidates and re-rank them exactly
+        self.rerank_factor = int(os.getenv('RAG_RERANK_FACTOR', '4'))
+        if isinstance(self.index, ShardedIndex):
+            self.needs_rerank = self.index.storage != 'flat'
+        else:
+            self.needs_rerank = not isinstance(self.index, faiss.IndexFlat)
         
-        # Load FAISS index
-        print("⚡ Loading FAISS index...")
-        self.index = faiss.read_index(index_path)
-        print(f"✅ Index loaded: {self.index.ntotal} vectors")
+        # "Shorter ones" refinements sort on duration_years; the served CSV
+        # only has the raw "4 years" / "18 months" text
+        if 'duration_years' not in self.data.columns and 'duration' in self.data.columns:
+            self.data['duration_years'] = parse_duration_years(self.data['duration'])
         
-        # Initialize embedding model
-        print("🧠 Loading embedding model...")
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
+        # Typeahead over program + university names
+        print("🔤 Building autocomplete index...")
+        self.autocomplete = AutocompleteIndex.from_catalogue(self.data)
+        print(f"✅ Autocomplete ready: {len(self.autocomplete)} names")
+        
+        # Catalogue-wide aggregates / orderings for "cheapest X", "compare X"
+        # (written next to the data by 03_faiss_index.py; rebuilt if the
+        # catalogue content no longer matches the stored fingerprint). Shared
+        # exports carry facets built from the very catalogue.arrow attached above
+        facets_path = os.path.join(self.shared_dir or os.path.dirname(data_path), 'facets.npz')
+        self.facets = FacetIndex.load(facets_path) if os.path.exists(facets_path) else None
+        if self.facets is None or (
+                not self.shared_dir and self.facets.fingerprint != catalogue_fingerprint(self.data)):
+            print("📐 Building faceted aggregates...")
+            self.facets = FacetIndex.build(self.data)
+        print(f"✅ Facets ready: {len(self.facets.g_count)} groups, {len(self.facets.u_count)} university groups")
+        
+        # Initialize embedding model (or use the shared encoder process; imported
+        # lazily so workers that use it never load torch)
+        self.encoder_address = os.getenv('RAG_ENCODER_ADDRESS')
+        if self.encoder_address:
+            print(f"🧠 Using shared encoder at {self.encoder_address}...")
+            self.embedding_model = EncoderClient(self.encoder_address)
+        else:
+            print("🧠 Loading embedding model...")
+            from sentence_transformers import SentenceTransformer
+            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
         print("✅ Model loaded!")
         
-        # Initialize Google LLM
-        print("🌐 Initializing Google Generative AI...")
-        api_key = os.getenv('GOOGLE_API_KEY')
-        if api_key:
-            genai.configure(api_key=api_key)
-            self.llm = genai.GenerativeModel('gemini-2.0-flash-exp')
-            print("✅ Google LLM initialized!")
+        # Initialize LLM (Gemini / OpenAI / stub, see llm_client.py)
+        print("🌐 Initializing LLM client...")
+        self.llm = build_llm_from_env()
+        if self.llm:
+            print(f"✅ LLM initialized: {self.llm.name}")
         else:
-            self.llm = None
-            print("⚠️ Google API key not found - will use template responses")
+            print("⚠️ No LLM API key found - will use template responses")
         
         # Initialize prompt templates (LangChain)
         self.prompt_templates = self._create_prompt_templates()
         
         self.history = []
         
+        # Conversation state for follow-ups ("cheaper ones?", "compare the first two"):
+        # each turn keeps a candidate pool of followup_pool ids plus its query vector
+        self.followup_pool = int(os.getenv('RAG_FOLLOWUP_POOL', '20'))
+        self.followup_blend = float(os.getenv('RAG_FOLLOWUP_BLEND', '0.6'))
+        self.max_sessions = int(os.getenv('RAG_MAX_SESSIONS', '1000'))
+        self.max_turns = 20
+        self.sessions = OrderedDict()
+        self.sessions_lock = threading.Lock()
+        
+        # Opt-in profiling (RAG_PROFILE=<requests> or the System Stats button);
+        # nothing is hooked until start()
+        self.profiler = Profiler(self)
+        if os.getenv('RAG_PROFILE'):
+            self.profiler.start(
+                int(os.getenv('RAG_PROFILE')),
+                mode=os.getenv('RAG_PROFILE_MODE', 'sample'),
+                memory=os.getenv('RAG_PROFILE_MEMORY', '1') != '0'
+            )
+        
         print("\n✅ RAG System ready!\n")
     
     def _create_prompt_templates(self) -> Dict:
@@ -117,6 +195,23 @@ Available Programs:
 {programs}
 
 Recommend the best options with reasoning."""
+            ),
+            
+            # Answers computed from the facet aggregates: the LLM only phrases them
+            'facts': PromptTemplate(
+                input_variables=['query', 'facts', 'programs'],
+                template="""You are a helpful university advisor.
+
+User Query: {query}
+
+Catalogue Facts (exact, computed over every program in the catalogue):
+{facts}
+
+Programs:
+{programs}
+
+Answer the query in a few friendly sentences using only these facts and programs.
+Do not add numbers, programs or universities that are not listed."""
             )
         }
         
@@ -159,7 +254,8 @@ Recommend the best options with reasoning."""
         for i, idx in enumerate(indices):
             idx_int = int(idx)  # Convert numpy int64 to Python int
             row = self.data.iloc[idx_int]
-            similarity = 1 / (1 + float(distances[i]))
+            # NaN distance: the row was ranked by the facet aggregates, not by similarity
+            similarity = None if np.isnan(distances[i]) else 1 / (1 + float(distances[i]))
             
             # Convert all values to safe strings/floats
             program = str(self._safe_get_value(row.get('program', 'N/A'))).strip()
@@ -198,64 +294,302 @@ Recommend the best options with reasoning."""
             except:
                 pass
             
-            info += f"   Match: {similarity:.2%}\n"
+            if similarity is not None:
+                info += f"   Match: {similarity:.2%}\n"
             formatted_list.append(info)
         
         return "\n".join(formatted_list)
     
-    def answer(self, query: str, k: int = 5) -> Dict:
-        """Answer user query"""
+    def encode(self, queries: List[str]) -> np.ndarray:
+        """Embed a batch of queries as a float32 [len(queries), d] matrix"""
+        query_embeddings = self.embedding_model.encode(
+            list(queries),
+            batch_size=64,
+            convert_to_numpy=True
+        )
+        return np.asarray(query_embeddings, dtype='float32').reshape(len(queries), -1)
+    
+    def search(self, queries: List[str], k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Encode a batch of queries and search FAISS in a single call
+        Returns (distances, indices), each shaped [len(queries), k]
+        """
+        return self.search_vectors(self.encode(queries), k)
+    
+    def search_vectors(self, query_f32: np.ndarray, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """search() for already-encoded query vectors"""
+        if not self.needs_rerank or self.rerank_factor <= 1:
+            return self.index.search(query_f32, k)
         
-        try:
-            # Step 1: Encode query
-            query_embedding = self.embedding_model.encode(query, convert_to_numpy=True)
-            
-            # Step 2: Search with FAISS
-            query_f32 = np.array([query_embedding]).astype('float32')
-            distances, indices = self.index.search(query_f32, k)
-            
-            # Step 3: Classify intent
-            intent = self._classify_intent(query)
-            
-            # Step 4: Format programs
-            programs_text = self._format_programs(indices, distances)
+        _, candidates = self.index.search(query_f32, k * self.rerank_factor)
+        return self._rerank(query_f32, candidates, k)
+    
+    def _rerank(self, query_f32: np.ndarray, candidates: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact squared-L2 re-ranking of candidate ids against the float32 matrix"""
+        safe = np.clip(candidates, 0, None)
+        # One sorted gather keeps memory-mapped reads sequential
+        unique_ids, inverse = np.unique(safe, return_inverse=True)
+        vectors = np.asarray(self.embeddings[unique_ids], dtype='float32')[inverse.reshape(safe.shape)]
+        exact = ((vectors - query_f32[:, None, :]) ** 2).sum(axis=2)
+        exact[candidates < 0] = np.inf
+        order = np.argsort(exact, axis=1)[:, :k]
+        return (np.take_along_axis(exact, order, axis=1).astype('float32'),
+                np.take_along_axis(candidates, order, axis=1))
+    
+    def _search_within(self, query_f32: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact squared-L2 search restricted to catalogue rows (facet filters)"""
+        vectors = np.asarray(self.embeddings[rows], dtype='float32')
+        exact = ((vectors - query_f32[0]) ** 2).sum(axis=1)
+        order = np.argsort(exact, kind='stable')[:k]
+        return exact[order][None, :].astype('float32'), rows[order][None, :]
+    
+    def plan_facets(self, query: str) -> Optional[Dict]:
+        """Facet plan for a ranking / comparison query, None for plain retrieval"""
+        return self.facets.plan(query, self._classify_intent(query))
+    
+    def _facet_hits(self, plan: Dict, query: str, k: int, facts: Dict) -> Tuple:
+        """
+        (distances, indices, vector, pool_distances, pool_indices) for a facet plan
+        Ranked plans come straight from the sorted orderings (NaN distances);
+        otherwise retrieval runs only over the rows matching the filters
+        """
+        if facts['indices'] is not None:
+            indices = facts['indices'][None, :]
+            pool_i = facts['pool']
+            return (np.full(indices.shape, np.nan, dtype='float32'), indices, None,
+                    np.full(len(pool_i), np.nan, dtype='float32'), pool_i)
+        
+        rows = np.flatnonzero(self.facets.mask(plan))
+        query_f32 = self.encode([query])
+        pool_d, pool_i = self._search_within(query_f32, rows, max(k, self.followup_pool))
+        return pool_d[:, :k], pool_i[:, :k], query_f32[0], pool_d[0], pool_i[0]
+    
+    def _turns(self, session: Optional[str]) -> List[Dict]:
+        """Turn list for a session id (self.history when no id is given)"""
+        if session is None:
+            return self.history
+        with self.sessions_lock:
+            turns = self.sessions.get(session)
+            if turns is None:
+                turns = self.sessions[session] = []
+                while len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+            else:
+                self.sessions.move_to_end(session)
+            return turns
+    
+    def is_followup(self, query: str, session: Optional[str] = None) -> bool:
+        """True when the query refers back to a previous turn that still has its candidates"""
+        turns = self._turns(session)
+        return bool(turns) and 'pool_indices' in turns[-1] and is_followup(query)
+    
+    def _column_values(self, column: str, ids: np.ndarray) -> np.ndarray:
+        """Numeric column values for row ids; 0 / missing means unknown (NaN)"""
+        values = pd.to_numeric(self.data[column].iloc[ids], errors='coerce').to_numpy(dtype='float64')
+        return np.where(values > 0, values, np.nan)
+    
+    def _refine(self, pool_d: np.ndarray, pool_i: np.ndarray, shown_i: np.ndarray,
+                column: str, mode: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Re-filter a candidate pool: 'lower' / 'higher' keep rows below / above the
+        median of the results shown last turn, 'lowest' / 'highest' re-sort by the column
+        """
+        if column not in self.data.columns:
+            return None
+        values = self._column_values(column, pool_i)
+        if mode in ('lowest', 'highest'):
+            order = np.argsort(values if mode == 'lowest' else -values, kind='stable')
+            order = order[~np.isnan(values[order])]
+            return pool_d[order], pool_i[order]
+        
+        shown = self._column_values(column, shown_i)
+        if np.isnan(shown).all():
+            return None
+        reference = np.nanmedian(shown)
+        keep = values < reference if mode == 'lower' else values > reference
+        return pool_d[keep], pool_i[keep]
+    
+    def resolve_followup(self, query: str, k: int = 5, session: Optional[str] = None) -> Optional[Dict]:
+        """
+        Answer a follow-up from the previous turn's retrieval state
+        ordinal  - "compare the first two": pick from the shown results, no search
+        refine   - "cheaper ones?": re-filter the previous candidate pool, no search
+        blend    - "what about in canada?": search with the new query vector
+                   blended with the previous one (plus any refinement filter)
+        Returns None when the query is not a follow-up.
+        """
+        if not self.is_followup(query, session):
+            return None
+        last = self._turns(session)[-1]
+        shown_d, shown_i = last['distances'][0], last['indices'][0]
+        pool_d, pool_i = last['pool_distances'], last['pool_indices']
+        rewritten = f"{query} (follow-up to: \"{last['query']}\")"
+        
+        def followup(kind, distances, indices, vector, pool):
+            return {
+                'kind': kind,
+                'query': rewritten,
+                'distances': distances[None, :],
+                'indices': indices[None, :],
+                'vector': vector,
+                'pool_distances': pool[0],
+                'pool_indices': pool[1]
+            }
+        
+        positions = parse_ordinals(query, len(shown_i))
+        if positions is not None:
+            return followup('ordinal', shown_d[positions], shown_i[positions], last['vector'], (pool_d, pool_i))
+        
+        refinement = parse_refinement(query)
+        if refinement and not content_words(query, refinement[2]):
+            refined = self._refine(pool_d, pool_i, shown_i, refinement[0], refinement[1])
+            if refined is not None and len(refined[1]):
+                return followup('refine', refined[0][:k], refined[1][:k], last['vector'], (pool_d, pool_i))
+        
+        # New content (or nothing left in the pool): one search around both turns
+        vectors = self.encode([query] if last['vector'] is not None else [query, last['query']])
+        previous = last['vector'] if last['vector'] is not None else vectors[1]
+        blended = self.followup_blend * vectors[0] + (1 - self.followup_blend) * previous
+        blended *= np.linalg.norm(vectors[0]) / max(np.linalg.norm(blended), 1e-12)
+        new_d, new_i = self.search_vectors(blended[None, :].astype('float32'), max(k, self.followup_pool))
+        valid = new_i[0] >= 0
+        new_d, new_i = new_d[0][valid], new_i[0][valid]
+        if refinement:
+            refined = self._refine(new_d, new_i, shown_i, refinement[0], refinement[1])
+            if refined is not None and len(refined[1]):
+                new_d, new_i = refined
+        return followup('blend', new_d[:k], new_i[:k], blended, (new_d, new_i))
+    
+    def _prepare(self, query: str, k: int, hits: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                 session: Optional[str] = None) -> Dict:
+        """Run retrieval (unless hits are given) and build the prompt for a query"""
+        
+        # Step 1-2: Follow-ups reuse the previous turn's candidates; otherwise
+        # encode query + search with FAISS (skipped when the caller already batched it)
+        followup = self.resolve_followup(query, k, session) if hits is None else None
+        
+        # Ranking / comparison over the whole catalogue: answered from the
+        # precomputed facet arrays, so the LLM only phrases the facts.
+        # Caller-supplied hits (e.g. the batch job's constrained results) win.
+        plan = self.plan_facets(query) if followup is None and hits is None else None
+        facts = self.facets.describe(plan, k) if plan is not None else None
+        if facts is not None:
+            distances, indices, vector, pool_d, pool_i = self._facet_hits(plan, query, k, facts)
+            prompt_query = query
+        elif followup is not None:
+            distances, indices = followup['distances'], followup['indices']
+            vector = followup['vector']
+            pool_d, pool_i = followup['pool_distances'], followup['pool_indices']
+            prompt_query = followup['query']
+        else:
+            if hits is None:
+                query_f32 = self.encode([query])
+                pool_d, pool_i = self.search_vectors(query_f32, max(k, self.followup_pool))
+                vector = query_f32[0]
+            else:
+                pool_d, pool_i = hits
+                vector = None
+            pool_d = np.asarray(pool_d).reshape(1, -1)[0]
+            pool_i = np.asarray(pool_i).reshape(1, -1)[0]
             
-            # Step 5: Get prompt template
+            # -1 means "no result" (fewer than k vectors, or a sharded search missing shards)
+            valid = pool_i >= 0
+            pool_d, pool_i = pool_d[valid], pool_i[valid]
+            distances, indices = pool_d[None, :k], pool_i[None, :k]
+            prompt_query = query
+        
+        # Step 3: Classify intent
+        intent = self._classify_intent(query)
+        
+        # Step 4: Format programs
+        programs_text = self._format_programs(indices, distances)
+        
+        # Step 5-6: Get prompt template and format prompt
+        if facts is not None:
+            prompt_text = self.prompt_templates['facts'].format(
+                query=prompt_query, facts=facts['facts'], programs=programs_text)
+            fallback = f"{facts['facts']}\n\n{programs_text}" if len(indices[0]) else facts['facts']
+        else:
             prompt_template = self.prompt_templates.get(intent, self.prompt_templates['search'])
-            
-            # Step 6: Format prompt
-            prompt_text = prompt_template.format(query=query, programs=programs_text)
+            prompt_text = prompt_template.format(query=prompt_query, programs=programs_text)
+            fallback = f"Found {len(indices[0])} programs:\n\n{programs_text}"
+        
+        return {
+            'intent': intent,
+            'programs_text': programs_text,
+            'prompt_text': prompt_text,
+            'indices': indices,
+            'distances': distances,
+            'vector': vector,
+            'pool_distances': pool_d,
+            'pool_indices': pool_i,
+            'followup': followup['kind'] if followup else None,
+            'facts': facts['facts'] if facts else None,
+            'fallback': fallback
+        }
+    
+    def _remember(self, query: str, prepared: Dict, response_text: str, remember: bool = True,
+                  session: Optional[str] = None) -> Dict:
+        """Store a finished turn in history and build the answer() result"""
+        indices = prepared['indices']
+        programs = self.data.iloc[indices[0]]
+        
+        # Step 8: Store in history (with the retrieval state follow-ups start from)
+        if remember:
+            turns = self._turns(session)
+            turns.append({
+                'query': query,
+                'intent': prepared['intent'],
+                'response': response_text,
+                'results': programs,
+                'indices': indices,
+                'distances': prepared['distances'],
+                'vector': prepared['vector'],
+                'pool_distances': prepared['pool_distances'],
+                'pool_indices': prepared['pool_indices']
+            })
+            if session is not None:
+                del turns[:-self.max_turns]
+        
+        return {
+            'response': response_text,
+            'programs': programs,
+            'intent': prepared['intent'],
+            'count': len(indices[0]),
+            'indices': indices,
+            'distances': prepared['distances'],
+            'followup': prepared['followup'],
+            'facts': prepared['facts']
+        }
+    
+    def answer(self, query: str, k: int = 5,
+               hits: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+               remember: bool = True, session: Optional[str] = None) -> Dict:
+        """
+        Answer user query
+        `hits` lets a caller that already ran search() for a batch of
+        queries pass in this query's (distances, indices) row;
+        `remember=False` keeps one-off (batch) queries out of self.history;
+        `session` keeps a separate conversation per id, so follow-ups
+        resolve against that user's previous turn
+        """
+        
+        try:
+            prepared = self._prepare(query, k, hits, session)
             
             # Step 7: Call Google LLM (if available)
             response_text = ""
             
             if self.llm:
                 try:
-                    response = self.llm.generate_content(prompt_text)
-                    response_text = response.text
-                except Exception as e:
+                    response_text = self.llm.generate(prepared['prompt_text'])
+                except LLMError as e:
                     print(f"⚠️ LLM error: {e}")
-                    response_text = f"Found {len(indices[0])} programs:\n\n{programs_text}"
+                    response_text = prepared['fallback']
             else:
-                response_text = f"Found {len(indices[0])} programs:\n\n{programs_text}"
+                response_text = prepared['fallback']
             
-            # Step 8: Store in history
-            self.history.append({
-                'query': query,
-                'intent': intent,
-                'response': response_text,
-                'results': self.data.iloc[indices[0]] if len(indices.shape) > 1 else self.data.iloc[indices],
-                'distances': distances
-            })
-            
-            return {
-                'response': response_text,
-                'programs': self.data.iloc[indices[0]] if len(indices.shape) > 1 else self.data.iloc[indices],
-                'intent': intent,
-                'count': len(indices[0]) if len(indices.shape) > 1 else len(indices),
-                'indices': indices,
-                'distances': distances
-            }
+            return self._remember(query, prepared, response_text, remember, session)
         
         except Exception as e:
             print(f"❌ Error in answer(): {e}")
@@ -268,6 +602,66 @@ Recommend the best options with reasoning."""
                 'intent': 'error',
                 'count': 0
             }
+    
+    def answer_stream(self, query: str, k: int = 5,
+                      hits: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                      session: Optional[str] = None,
+                      on_programs: Optional[Callable[[np.ndarray, np.ndarray], None]] = None,
+                      remember: bool = True) -> Iterator[str]:
+        """
+        Same as answer() but yields the response text in chunks as the
+        LLM produces them (a single chunk in template mode)
+        `on_programs(distances, indices)` is called once retrieval is done,
+        before the first chunk
+        """
+        prepared = self._prepare(query, k, hits, session)
+        if on_programs is not None:
+            on_programs(prepared['distances'], prepared['indices'])
+        chunks = []
+        
+        if self.llm:
+            try:
+                for text in self.llm.stream(prepared['prompt_text']):
+                    chunks.append(text)
+                    yield text
+            except LLMError as e:
+                print(f"⚠️ LLM error: {e}")
+                if not chunks:
+                    chunks.append(prepared['fallback'])
+                    yield prepared['fallback']
+        else:
+            chunks.append(prepared['fallback'])
+            yield prepared['fallback']
+        
+        self._remember(query, prepared, "".join(chunks), remember, session)
+    
+    def suggest(self, prefix: str, n: int = 5) -> List[Dict]:
+        """Typeahead suggestions for program / university names (sub-millisecond)"""
+        return self.autocomplete.suggest(prefix, n)
+    
+    def programs_to_records(self, programs: pd.DataFrame) -> List[Dict]:
+        """Convert a programs frame to JSON-safe dicts (NaN -> None)"""
+        if programs is None:
+            return []
+        return [
+            {col: self._safe_get_value(val) for col, val in row.items()}
+            for row in programs.to_dict(orient='records')
+        ]
+    
+    def stats(self) -> Dict:
+        """Numbers shown in the System Stats panel"""
+        return {
+            'programs': len(self.data),
+            'vectors': int(self.index.ntotal),
+            'llm': self.llm is not None,
+            'llm_provider': self.llm.name if self.llm else None,
+            'llm_circuit': self.llm.breaker.state if self.llm else None,
+            'shared_memory': bool(self.shared_dir),
+            'encoder': self.encoder_address or 'local',
+            'facet_groups': len(self.facets.g_count),
+            'profiling': self.profiler.active,
+            'runtime': runtime_info()
+        }
 
 
 # ============================================================================
@@ -299,7 +693,11 @@ if __name__ == "__main__":
     test_queries = [
         "Find cheap engineering programs",
         "Compare master's programs",
-        "Recommend best options"
+        "Recommend best options",
+        "Cheaper ones?",
+        "Compare the first two",
+        "Compare CS masters",
+        "Under $10k universities"
     ]
     
     print("\n" + "="*80)
@@ -313,6 +711,8 @@ if __name__ == "__main__":
         result = chatbot.answer(query, k=3)
         
         print(f"✅ Intent: {result['intent']}")
+        if result.get('followup'):
+            print(f"✅ Follow-up: {result['followup']} (answered from the previous turn)")
         print(f"✅ Found: {result['count']} programs\n")
         print("Response:")
         print(result['response'][:400])
@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SCRIPT 6: RETRIEVAL HTTP/JSON SERVICE
+Loads the index + encoder once and serves them over plain HTTP so the
+Streamlit UI (and anything else) can stay a thin client.
+
+Endpoints:
+    GET  /health          -> liveness (process is up)
+    GET  /ready           -> readiness (index + encoder loaded) + stats
+    POST /search          -> {"query": str | "queries": [str], "k": int}
+    POST /answer          -> {"query": str, "k": int, "session": str (optional)}
+    POST /answer/stream   -> same body, NDJSON stream of response chunks
+    GET  /suggest?q=..&n= -> typeahead suggestions for program / university names
+
+Usage:
+    python notebooks/06_serve_api.py --port 8000 --workers 8
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from queue import Empty, Queue
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+NOTEBOOKS_DIR = Path(__file__).parent
+
+DATA_FILE = "./data/processed/universities_data.csv"
+EMBEDDINGS_FILE = "./data/processed/embeddings.pkl"
+# A shards directory (03_faiss_index.py --shards N) can be used in place of the .bin file
+FAISS_INDEX_FILE = os.getenv("RAG_INDEX_PATH", "./data/processed/faiss_index.bin")
+
+MAX_K = 50
+
+
+def load_rag_class():
+    """Import RAGChatbotWithGoogle from 05_rag_system.py"""
+    spec = importlib.util.spec_from_file_location(
+        "rag_system",
+        NOTEBOOKS_DIR / "05_rag_system.py"
+    )
+    rag_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(rag_module)
+    return rag_module.RAGChatbotWithGoogle
+
+
+class SearchBatcher:
+    """
+    Collects concurrent search requests and runs them through
+    RAGChatbotWithGoogle.search() as one encode + one FAISS call.
+    A batch is flushed when it reaches `max_batch` queries or when the
+    oldest request has waited `max_wait_ms`.
+    """
+
+    def __init__(self, rag, max_batch: int = 32, max_wait_ms: float = 5.0):
+        self.rag = rag
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Queue = Queue()
+        self._thread = threading.Thread(target=self._run, name="search-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, query: str, k: int) -> Future:
+        """Queue one query; the future resolves to (distances, indices) shaped [1, k]"""
+        future: Future = Future()
+        self._queue.put((query, k, future))
+        return future
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self.submit(query, k).result()
+
+    def _collect(self) -> List:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            queries = [query for query, _, _ in batch]
+            k_max = max(k for _, k, _ in batch)
+            try:
+                distances, indices = self.rag.search(queries, k_max)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            for row, (_, k, future) in enumerate(batch):
+                future.set_result((distances[row:row + 1, :k], indices[row:row + 1, :k]))
+
+
+class RAGService:
+    """Owns the single RAG instance, the search batcher and the worker pool"""
+
+    def __init__(self, data_path: str, embeddings_path: str, index_path: str,
+                 workers: int = 8, max_batch: int = 32, max_wait_ms: float = 5.0):
+        self.ready = False
+        self.error = None
+        self.started = time.time()
+        self.paths = (data_path, embeddings_path, index_path)
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-worker")
+        self.rag = None
+        self.batcher = None
+
+    def load(self):
+        """Load data, index and encoder; /ready flips to 200 once this finishes"""
+        try:
+            RAGChatbotWithGoogle = load_rag_class()
+            data_path, embeddings_path, index_path = self.paths
+            self.rag = RAGChatbotWithGoogle(
+                data_path=data_path,
+                embeddings_path=embeddings_path,
+                index_path=index_path
+            )
+            self.batcher = SearchBatcher(self.rag, max_batch=self.max_batch, max_wait_ms=self.max_wait_ms)
+            self.ready = True
+        except Exception as e:
+            self.error = str(e)
+            print(f"❌ Could not load RAG system: {e}")
+
+    def _hits_to_results(self, distances: np.ndarray, indices: np.ndarray) -> List[Dict]:
+        programs = self.rag.data.iloc[indices[0]]
+        records = self.rag.programs_to_records(programs)
+        for record, idx, dist in zip(records, indices[0], distances[0]):
+            record['id'] = int(idx)
+            # Facet-ranked rows have no similarity (NaN distance)
+            record['score'] = None if np.isnan(dist) else 1 / (1 + float(dist))
+        return records
+
+    def search(self, queries: List[str], k: int) -> List[List[Dict]]:
+        futures = [self.batcher.submit(query, k) for query in queries]
+        return [self._hits_to_results(*future.result()) for future in futures]
+
+    def _hits(self, query: str, k: int, session: Optional[str]):
+        """
+        Batched search hits for a fresh query (a full candidate pool, so the
+        next turn can refine it), or None for a follow-up the RAG system
+        answers from the session's previous turn / a ranking or comparison
+        query it answers from the facet aggregates
+        """
+        if session and self.rag.is_followup(query, session):
+            return None
+        if self.rag.plan_facets(query) is not None:
+            return None
+        return self.batcher.search(query, max(k, self.rag.followup_pool))
+
+    def answer(self, query: str, k: int, session: Optional[str] = None) -> Dict:
+        hits = self._hits(query, k, session)
+        # Only session turns are kept: sessionless requests would otherwise
+        # pile up in the shared, unbounded rag.history
+        result = self.pool.submit(self.rag.answer, query, k, hits, session is not None, session).result()
+        return {
+            'response': result['response'],
+            'intent': result['intent'],
+            'count': result['count'],
+            'followup': result.get('followup'),
+            'programs': self._hits_to_results(result['distances'], result['indices']) if result['count'] else []
+        }
+
+    def answer_stream(self, query: str, k: int, session: Optional[str] = None):
+        """Yields NDJSON-ready events: programs first, then text chunks, then done"""
+        hits = self._hits(query, k, session)
+
+        # Run the generator on a pool thread so the worker limit also covers streaming
+        chunks: Queue = Queue()
+
+        def programs(distances, indices):
+            chunks.put({'type': 'programs', 'programs': self._hits_to_results(distances, indices)})
+
+        def produce():
+            try:
+                for text in self.rag.answer_stream(query, k, hits, session, programs, session is not None):
+                    chunks.put({'type': 'chunk', 'text': text})
+            except Exception as e:
+                chunks.put({'type': 'error', 'error': str(e)})
+            chunks.put(None)
+
+        self.pool.submit(produce)
+        while (event := chunks.get()) is not None:
+            yield event
+        yield {'type': 'done'}
+
+    def status(self) -> Dict:
+        status = {'ready': self.ready, 'uptime_s': round(time.time() - self.started, 1)}
+        if self.error:
+            status['error'] = self.error
+        if self.ready:
+            status.update(self.rag.stats())
+        return status
+
+
+def make_handler(service: RAGService):
+    """Build the request handler class bound to one RAGService"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send_json(self, payload: Dict, status: int = 200):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_body(self) -> Dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            if not length:
+                return {}
+            body = json.loads(self.rfile.read(length).decode('utf-8'))
+            if not isinstance(body, dict):
+                raise ValueError("request body must be a JSON object")
+            return body
+
+        def _query_args(self, body: Dict) -> Tuple[str, int, Optional[str]]:
+            query = str(body.get('query', '')).strip()
+            if not query:
+                raise ValueError("'query' is required")
+            k = self._k(body)
+            session = body.get('session')
+            return query, k, str(session) if session else None
+
+        @staticmethod
+        def _k(body: Dict) -> int:
+            try:
+                return min(max(int(body.get('k', 5)), 1), MAX_K)
+            except (TypeError, ValueError):
+                raise ValueError("'k' must be an integer")
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send_json({'status': 'ok'})
+            elif self.path == "/ready":
+                status = service.status()
+                self._send_json(status, 200 if status['ready'] else 503)
+            elif self.path.startswith("/suggest"):
+                if not service.ready:
+                    self._send_json({'error': 'service is still loading'}, 503)
+                    return
+                params = parse_qs(urlparse(self.path).query)
+                prefix = params.get('q', [''])[0]
+                try:
+                    n = min(max(int(params.get('n', ['5'])[0]), 1), MAX_K)
+                except ValueError:
+                    self._send_json({'error': "'n' must be an integer"}, 400)
+                    return
+                self._send_json({'suggestions': service.rag.suggest(prefix, n)})
+            else:
+                self._send_json({'error': f"unknown path {self.path}"}, 404)
+
+        def do_POST(self):
+            if not service.ready:
+                self._send_json({'error': 'service is still loading'}, 503)
+                return
+            try:
+                body = self._read_body()
+                if self.path == "/search":
+                    queries = body.get('queries') or [self._query_args(body)[0]]
+                    if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+                        raise ValueError("'queries' must be a list of strings")
+                    k = self._k(body)
+                    self._send_json({'results': service.search(queries, k)})
+                elif self.path == "/answer":
+                    self._send_json(service.answer(*self._query_args(body)))
+                elif self.path == "/answer/stream":
+                    self._stream(service.answer_stream(*self._query_args(body)))
+                else:
+                    self._send_json({'error': f"unknown path {self.path}"}, 404)
+            except (ValueError, TypeError, json.JSONDecodeError) as e:
+                self._send_json({'error': str(e)}, 400)
+            except Exception as e:
+                print(f"❌ Error serving {self.path}: {e}")
+                self._send_json({'error': str(e)}, 500)
+
+        def _stream(self, events):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for event in events:
+                line = (json.dumps(event) + "\n").encode('utf-8')
+                self.wfile.write(f"{len(line):X}\r\n".encode('ascii') + line + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+
+def serve(host: str = "0.0.0.0", port: int = 8000, workers: int = 8,
+          max_batch: int = 32, max_wait_ms: float = 5.0):
+    """Load the RAG system once and serve it until interrupted"""
+
+    print("\n" + "="*80)
+    print(" STEP 6: RETRIEVAL HTTP SERVICE")
+    print("="*80 + "\n")
+
+    service = RAGService(
+        data_path=DATA_FILE,
+        embeddings_path=EMBEDDINGS_FILE,
+        index_path=FAISS_INDEX_FILE,
+        workers=workers,
+        max_batch=max_batch,
+        max_wait_ms=max_wait_ms
+    )
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    # Load in the background so /health answers (and /ready reports 503) while warming up
+    threading.Thread(target=service.load, name="rag-loader", daemon=True).start()
+    print(f"✅ Serving on http://{host}:{port} ({workers} workers, batch ≤{max_batch} / {max_wait_ms}ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down")
+    finally:
+        server.server_close()
+        service.pool.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the RAG system over HTTP")
+    parser.add_argument("--host", default=os.getenv("RAG_API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("RAG_API_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("RAG_API_WORKERS", "8")))
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.workers, args.max_batch, args.max_wait_ms)
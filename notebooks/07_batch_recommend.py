@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SCRIPT 7: OFFLINE BULK RECOMMENDATIONS
+Ranks programs for a whole file of applicant profiles in one run.
+
+Input  (CSV or JSONL), one applicant per row:
+    id, query               required
+    max_fees, max_ielts,    optional hard constraints (blank = no limit)
+    max_toefl, k            optional per-applicant result count
+
+Output:
+    *.jsonl    one line per applicant with its ranked programs
+    *.parquet  a directory of part files, one row per (applicant, rank)
+
+The input is streamed in chunks (one batched encode + FAISS search per
+chunk), results are flushed after every chunk and a checkpoint file makes
+re-running the same command resume where it stopped. Memory use depends on
+--chunk-size, not on the size of the input file.
+
+Constraints are applied to the k * --overfetch nearest neighbours; an
+applicant left with fewer than k programs falls back to an exact search over
+every catalogue row that satisfies their constraints, so tight budgets still
+get results. Applicants that end up short anyway (fewer matching rows than
+k) are counted in the progress output.
+
+Usage:
+    python notebooks/07_batch_recommend.py applicants.csv results.jsonl --llm --llm-concurrency 4
+"""
+
+import argparse
+import importlib.util
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+NOTEBOOKS_DIR = Path(__file__).parent
+
+DATA_FILE = "./data/processed/universities_data.csv"
+EMBEDDINGS_FILE = "./data/processed/embeddings.pkl"
+FAISS_INDEX_FILE = "./data/processed/faiss_index.bin"
+
+CONSTRAINTS = {'max_fees': 'fees', 'max_ielts': 'ielts', 'max_toefl': 'toefl'}
+RESULT_COLUMNS = ['program', 'university_name', 'duration', 'fees', 'ielts', 'toefl']
+
+
+def load_rag_class():
+    """Import RAGChatbotWithGoogle from 05_rag_system.py"""
+    spec = importlib.util.spec_from_file_location(
+        "rag_system",
+        NOTEBOOKS_DIR / "05_rag_system.py"
+    )
+    rag_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(rag_module)
+    return rag_module.RAGChatbotWithGoogle
+
+
+# ============================================================================
+# INPUT
+# ============================================================================
+
+def iter_input(path: str, chunk_size: int, skip: int = 0) -> Iterator[pd.DataFrame]:
+    """Yield DataFrame chunks of the applicant file, skipping `skip` rows already done"""
+    if path.endswith('.jsonl') or path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = (line for line in f if line.strip())
+            for _ in itertools.islice(lines, skip):
+                pass
+            while True:
+                batch = list(itertools.islice(lines, chunk_size))
+                if not batch:
+                    return
+                yield pd.DataFrame([json.loads(line) for line in batch])
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, skiprows=range(1, skip + 1))
+
+
+# ============================================================================
+# OUTPUT (incremental, resumable)
+# ============================================================================
+
+class ResultWriter:
+    """
+    Appends result chunks and records a checkpoint after each one.
+    The checkpoint stores the number of input rows fully written, so a
+    crash between a write and its checkpoint is rolled back on resume.
+    """
+
+    def __init__(self, output: str):
+        self.output = output
+        self.checkpoint_path = f"{output.rstrip('/')}.ckpt"
+        self.state = {'rows_done': 0, 'bytes': 0}
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, 'r') as f:
+                self.state = json.load(f)
+
+    @property
+    def rows_done(self) -> int:
+        return self.state['rows_done']
+
+    def _save_checkpoint(self):
+        tmp = f"{self.checkpoint_path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def write(self, records: List[Dict], input_rows: int):
+        raise NotImplementedError
+
+
+class JSONLWriter(ResultWriter):
+
+    def __init__(self, output: str):
+        super().__init__(output)
+        # Drop anything written after the last checkpoint
+        mode = 'r+b' if os.path.exists(output) else 'wb'
+        self.file = open(output, mode)
+        self.file.truncate(self.state['bytes'])
+        self.file.seek(self.state['bytes'])
+
+    def write(self, records: List[Dict], input_rows: int):
+        for record in records:
+            self.file.write((json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8'))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.state = {'rows_done': self.rows_done + input_rows, 'bytes': self.file.tell()}
+        self._save_checkpoint()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter(ResultWriter):
+    """Writes part-<first input row>.parquet files, one per chunk"""
+
+    def __init__(self, output: str):
+        super().__init__(output)
+        os.makedirs(output, exist_ok=True)
+        for part in Path(output).glob("part-*.parquet"):
+            if int(part.stem.split('-')[1]) >= self.rows_done:
+                part.unlink()
+
+    def write(self, records: List[Dict], input_rows: int):
+        rows = [
+            {'id': r['id'], 'query': r['query'], 'intent': r['intent'],
+             'response': r.get('response'), 'rank': rank, **program}
+            for r in records
+            for rank, program in enumerate(r['programs'], 1)
+        ]
+        part = Path(self.output) / f"part-{self.rows_done:09d}.parquet"
+        tmp = part.with_suffix('.tmp')
+        pd.DataFrame(rows).to_parquet(tmp, index=False)
+        os.replace(tmp, part)
+        self.state = {'rows_done': self.rows_done + input_rows, 'bytes': 0}
+        self._save_checkpoint()
+
+    def close(self):
+        pass
+
+
+# ============================================================================
+# JOB
+# ============================================================================
+
+class BatchRecommender:
+    """Chunked encode -> search -> constraint filter -> (LLM) for many applicants"""
+
+    def __init__(self, rag, k: int = 5, overfetch: int = 4, use_llm: bool = False,
+                 llm_concurrency: int = 4):
+        self.rag = rag
+        self.k = k
+        self.overfetch = overfetch
+        self.use_llm = use_llm and rag.llm is not None
+        self.llm_pool = ThreadPoolExecutor(max_workers=llm_concurrency) if self.use_llm else None
+        self.result_columns = [col for col in RESULT_COLUMNS if col in rag.data.columns]
+        # Numeric catalogue columns, extracted once for vectorized filtering
+        self.columns = {
+            col: pd.to_numeric(rag.data[col], errors='coerce').to_numpy(dtype='float32')
+            for col in CONSTRAINTS.values() if col in rag.data.columns
+        }
+        # Applicants answered by the exact fallback / still short of k
+        self.exact_fallbacks = 0
+        self.short = 0
+
+    def _limits(self, chunk: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Per-row limit for each constrained catalogue column (NaN = no limit)"""
+        return {
+            data_col: pd.to_numeric(chunk[limit_col], errors='coerce').to_numpy(dtype='float32')
+            for limit_col, data_col in CONSTRAINTS.items()
+            if limit_col in chunk.columns and data_col in self.columns
+        }
+
+    def _allowed(self, limits: Dict[str, np.ndarray], indices: np.ndarray) -> np.ndarray:
+        """
+        Which catalogue ids satisfy the constraints; `limits` arrays broadcast
+        against `indices`. Unknown limit or unknown value never excludes a program
+        """
+        mask = indices >= 0
+        for data_col, limit in limits.items():
+            values = self.columns[data_col][np.clip(indices, 0, None)]
+            mask &= np.isnan(limit) | np.isnan(values) | (values <= limit)
+        return mask
+
+    def _filter(self, limits: Dict[str, np.ndarray], indices: np.ndarray, k_max: int) -> np.ndarray:
+        """Keep the first k_max candidates per row that satisfy that row's constraints (-1 = none)"""
+        mask = self._allowed({col: limit[:, None] for col, limit in limits.items()}, indices)
+        order = np.argsort(~mask, axis=1, kind='stable')[:, :k_max]
+        kept = np.take_along_axis(indices, order, axis=1)
+        kept[~np.take_along_axis(mask, order, axis=1)] = -1
+        return kept
+
+    def process_chunk(self, chunk: pd.DataFrame) -> List[Dict]:
+        queries = chunk['query'].astype(str).tolist()
+        ks = pd.to_numeric(chunk['k'], errors='coerce').fillna(self.k).astype(int).to_numpy() \
+            if 'k' in chunk.columns else np.full(len(chunk), self.k)
+        k_max = int(ks.max())
+
+        vectors = self.rag.encode(queries)
+        distances, indices = self.rag.search_vectors(vectors, k_max * self.overfetch)
+        limits = self._limits(chunk)
+        kept = self._filter(limits, indices, k_max)
+        dist_by_id = [dict(zip(idx_row, dist_row)) for idx_row, dist_row in zip(indices, distances)]
+
+        # Tight constraints can reject every overfetched neighbour: rank the
+        # rows that do satisfy them exactly instead of returning a short list
+        for row in np.flatnonzero(kept[np.arange(len(chunk)), ks - 1] < 0):
+            row_limits = {col: limit[row] for col, limit in limits.items()}
+            if all(np.isnan(limit) for limit in row_limits.values()):
+                continue
+            rows = np.flatnonzero(self._allowed(row_limits, np.arange(len(self.rag.data))))
+            exact_d, exact_i = self.rag._search_within(vectors[row:row + 1], rows, ks[row])
+            kept[row] = -1
+            kept[row, :exact_i.shape[1]] = exact_i[0]
+            dist_by_id[row] = dict(zip(exact_i[0], exact_d[0]))
+            self.exact_fallbacks += 1
+
+        ids = chunk['id'].tolist() if 'id' in chunk.columns else list(range(len(chunk)))
+        records = []
+        for row, (applicant_id, query) in enumerate(zip(ids, queries)):
+            row_ids = [int(i) for i in kept[row, :ks[row]] if i >= 0]
+            self.short += len(row_ids) < ks[row]
+            programs = self.rag.programs_to_records(self.rag.data.iloc[row_ids][self.result_columns])
+            for program, idx in zip(programs, row_ids):
+                program['id'] = idx
+                program['score'] = 1 / (1 + float(dist_by_id[row][idx]))
+            records.append({
+                'id': applicant_id,
+                'query': query,
+                'intent': self.rag._classify_intent(query),
+                'programs': programs,
+                '_hits': (np.array([[dist_by_id[row][i] for i in row_ids]], dtype='float32'),
+                          np.array([row_ids], dtype='int64'))
+            })
+
+        if self.use_llm:
+            def respond(record):
+                if not record['programs']:
+                    return None
+                hits = record['_hits']
+                return self.rag.answer(record['query'], hits[1].shape[1], hits, remember=False)['response']
+            for record, response in zip(records, self.llm_pool.map(respond, records)):
+                record['response'] = response
+
+        for record in records:
+            del record['_hits']
+        return records
+
+    def close(self):
+        if self.llm_pool:
+            self.llm_pool.shutdown()
+
+
+def run_batch(input_path: str, output_path: str, chunk_size: int = 512, k: int = 5,
+              use_llm: bool = False, llm_concurrency: int = 4, overfetch: int = 4):
+    """Run (or resume) the bulk recommendation job"""
+
+    print("\n" + "="*80)
+    print(" STEP 7: BULK RECOMMENDATIONS")
+    print("="*80 + "\n")
+
+    writer = ParquetWriter(output_path) if output_path.endswith('.parquet') else JSONLWriter(output_path)
+    if writer.rows_done:
+        print(f"↩️ Resuming after {writer.rows_done:,} applicants")
+
+    RAGChatbotWithGoogle = load_rag_class()
+    rag = RAGChatbotWithGoogle(
+        data_path=DATA_FILE,
+        embeddings_path=EMBEDDINGS_FILE,
+        index_path=FAISS_INDEX_FILE
+    )
+    job = BatchRecommender(rag, k=k, overfetch=overfetch, use_llm=use_llm, llm_concurrency=llm_concurrency)
+
+    start = time.time()
+    done = 0
+    try:
+        for chunk in iter_input(input_path, chunk_size, skip=writer.rows_done):
+            records = job.process_chunk(chunk)
+            writer.write(records, len(chunk))
+            done += len(chunk)
+            elapsed = time.time() - start
+            print(f"   {writer.rows_done:,} applicants written | {done / elapsed:,.1f} rows/s | "
+                  f"{job.exact_fallbacks:,} exact fallbacks | {job.short:,} with fewer than k | {elapsed:,.0f}s")
+    finally:
+        job.close()
+        writer.close()
+
+    print(f"\n✅ Done: {done:,} applicants in {time.time() - start:.1f}s -> {output_path}")
+    if job.short:
+        print(f"⚠️ {job.short:,} applicants got fewer than k programs (not enough catalogue rows meet their constraints)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank programs for a file of applicant profiles")
+    parser.add_argument("input", help="CSV or JSONL with id, query and optional max_fees/max_ielts/max_toefl/k")
+    parser.add_argument("output", help="results .jsonl file or .parquet directory")
+    parser.add_argument("--chunk-size", type=int, default=512)
+    parser.add_argument("-k", type=int, default=5, help="programs per applicant")
+    parser.add_argument("--llm", action="store_true", help="also generate an LLM response per applicant")
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    parser.add_argument("--overfetch", type=int, default=4,
+                        help="neighbours fetched per result before applying constraints")
+    args = parser.parse_args()
+
+    run_batch(args.input, args.output, args.chunk_size, args.k, args.llm, args.llm_concurrency, args.overfetch)
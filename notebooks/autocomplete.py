@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TYPEAHEAD INDEX OVER PROGRAM + UNIVERSITY NAMES
+Built once at startup from the catalogue; answers suggest(prefix, n) in
+well under a millisecond so misspelled names can be fixed before a full
+encode + search + LLM round trip.
+
+Layout (compact, no per-name Python objects beyond the name list):
+    blob        all names joined by "\\n" (one str)
+    word_starts int32 offsets of every word start in blob, sorted by the
+                text that follows them -> prefix match on any word is a
+                bisect over this sorted array
+    trigrams    CSR postings: sorted unique trigram codes + offsets into a
+                name-id array -> fuzzy match by counting shared trigrams,
+                reading only the rarest query trigrams
+"""
+
+import bisect
+import re
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+PROGRAM = 1
+UNIVERSITY = 2
+KIND_NAMES = {PROGRAM: 'program', UNIVERSITY: 'university', PROGRAM | UNIVERSITY: 'program'}
+
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(text: str) -> str:
+    return _SPACES.sub(' ', str(text).lower()).strip()
+
+
+class _PrefixView:
+    """
+    Read-only sequence of the first `width` characters at each offset, so
+    bisect can search the sorted word starts without key= (Python 3.10+)
+    """
+
+    def __init__(self, blob: str, starts: np.ndarray, width: int):
+        self.blob, self.starts, self.width = blob, starts, width
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, i: int) -> str:
+        offset = self.starts[i]
+        return self.blob[offset:offset + self.width]
+
+
+def _trigram_codes(padded: bytes) -> np.ndarray:
+    b = np.frombuffer(padded, dtype=np.uint8).astype(np.int32)
+    if len(b) < 3:
+        return np.empty(0, dtype=np.int32)
+    return (b[:-2] << 16) | (b[1:-1] << 8) | b[2:]
+
+
+class AutocompleteIndex:
+    """Prefix + fuzzy suggestions over a fixed list of names"""
+
+    def __init__(self, names: Iterable[str], kinds: Iterable[int] = None, max_postings: int = 8_000):
+        kinds = list(kinds) if kinds is not None else None
+        merged: Dict[str, int] = {}
+        for i, name in enumerate(names):
+            key = normalize(name)
+            if key and key != 'nan':
+                merged[key] = merged.get(key, 0) | (kinds[i] if kinds else PROGRAM)
+        self.names: List[str] = list(merged)
+        self.kinds = np.fromiter(merged.values(), dtype=np.int8, count=len(merged))
+        self.max_postings = max_postings
+        self._build_prefix()
+        self._build_trigrams()
+
+    @classmethod
+    def from_catalogue(cls, data, columns=('program', 'university_name')) -> "AutocompleteIndex":
+        names, kinds = [], []
+        for col, kind in zip(columns, (PROGRAM, UNIVERSITY)):
+            if col in data.columns:
+                values = data[col].dropna().astype(str).unique()
+                names.extend(values)
+                kinds.extend([kind] * len(values))
+        return cls(names, kinds)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # ------------------------------------------------------------------ build
+
+    def _build_prefix(self):
+        self.blob = "\n".join(self.names)
+        lengths = np.fromiter((len(n) + 1 for n in self.names), dtype=np.int64, count=len(self.names))
+        self.name_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+
+        chars = np.frombuffer(self.blob.encode('utf-32-le'), dtype=np.uint32)
+        is_word = (chars != ord(' ')) & (chars != ord('\n'))
+        prev_gap = np.concatenate([[True], ~is_word[:-1]])
+        starts = np.flatnonzero(is_word & prev_gap)
+        # Sort word starts by the text after them (first 48 chars is plenty to order prefixes)
+        blob = self.blob
+        order = sorted(range(len(starts)), key=lambda i: blob[starts[i]:starts[i] + 48])
+        self.word_starts = starts[np.asarray(order, dtype=np.int64)].astype(np.int32) if len(order) else starts
+
+    def _build_trigrams(self):
+        padded = [f" {n} ".encode('utf-8') for n in self.names]
+        counts = np.fromiter((max(len(p) - 2, 0) for p in padded), dtype=np.int64, count=len(padded))
+        codes = _trigram_codes(b"".join(padded)) if padded else np.empty(0, dtype=np.int32)
+        # Owner name of every byte position; drop trigrams that straddle two names
+        byte_lengths = np.fromiter((len(p) for p in padded), dtype=np.int64, count=len(padded))
+        owner = np.repeat(np.arange(len(padded), dtype=np.int64), byte_lengths)[:len(codes)]
+        byte_ends = np.cumsum(byte_lengths)
+        inside = np.arange(len(codes), dtype=np.int64) + 3 <= byte_ends[owner]
+        codes, owner = codes[inside], owner[inside]
+
+        # Plain sort + diff instead of np.unique, which is far slower on tens of millions of keys
+        pairs = (codes.astype(np.int64) << 32) | owner
+        pairs.sort()
+        pairs = pairs[np.concatenate([[True], pairs[1:] != pairs[:-1]])] if len(pairs) else pairs
+        pair_codes = (pairs >> 32).astype(np.int32)
+        self.postings = (pairs & 0xFFFFFFFF).astype(np.int32)
+        first = np.flatnonzero(np.concatenate([[True], pair_codes[1:] != pair_codes[:-1]])) \
+            if len(pair_codes) else np.empty(0, dtype=np.int64)
+        self.trigram_codes = pair_codes[first]
+        self.trigram_offsets = np.append(first, len(pair_codes)).astype(np.int64)
+        self.trigram_counts = counts.astype(np.int32)
+
+    # ----------------------------------------------------------------- query
+
+    def _prefix_ids(self, prefix: str, limit: int) -> List[int]:
+        starts = self.word_starts
+        view = _PrefixView(self.blob, starts, len(prefix))
+        lo = bisect.bisect_left(view, prefix)
+        hi = bisect.bisect_right(view, prefix, lo=lo)
+        offsets = starts[lo:min(hi, lo + limit * 8)]
+        ids = np.searchsorted(self.name_starts, offsets, side='right') - 1
+        # Names starting with the prefix first, then mid-name word matches; shorter names first
+        at_start = self.name_starts[ids] == offsets
+        lengths = np.fromiter((len(self.names[i]) for i in ids), dtype=np.int64, count=len(ids))
+        order = np.lexsort((lengths, ~at_start))
+        seen, out = set(), []
+        for i in ids[order]:
+            if i not in seen:
+                seen.add(i)
+                out.append(int(i))
+                if len(out) == limit:
+                    break
+        return out
+
+    def _fuzzy_ids(self, text: str, limit: int, exclude: set) -> List[int]:
+        q = np.unique(_trigram_codes(f" {text} ".encode('utf-8')))
+        if not len(q):
+            return []
+        pos = np.searchsorted(self.trigram_codes, q)
+        known = pos < len(self.trigram_codes)
+        pos, q_known = pos[known], q[known]
+        pos = pos[self.trigram_codes[pos] == q_known]
+        if not len(pos):
+            return []
+        lo, hi = self.trigram_offsets[pos], self.trigram_offsets[pos + 1]
+        # Rarest trigrams first, within a postings budget
+        order = np.argsort(hi - lo)
+        budget = np.cumsum((hi - lo)[order]) <= self.max_postings
+        budget[0] = True
+        chosen = order[budget]
+        candidates = np.concatenate([self.postings[lo[i]:hi[i]] for i in chosen])
+        ids, shared = np.unique(candidates, return_counts=True)
+        score = shared / (len(q) + self.trigram_counts[ids] - shared)
+        # Partial selection of the best few, then sort just those
+        want = min(limit + len(exclude), len(ids))
+        best = np.argpartition(-score, want - 1)[:want]
+        top = ids[best[np.argsort(-score[best], kind='stable')]]
+        return [int(i) for i in top if int(i) not in exclude][:limit]
+
+    def suggest(self, prefix: str, n: int = 5) -> List[Dict]:
+        """Up to n {'text', 'type'} suggestions: word-prefix matches first, then fuzzy ones"""
+        text = normalize(prefix)
+        if not text or not self.names:
+            return []
+        ids = self._prefix_ids(text, n)
+        if len(ids) < n and len(text) >= 3:
+            ids += self._fuzzy_ids(text, n - len(ids), set(ids))
+        return [{'text': self.names[i], 'type': KIND_NAMES[int(self.kinds[i])]} for i in ids]
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK: STREAMLIT RERUN TIME VS SESSION LENGTH
+Runs app.py headless with streamlit.testing (no browser, no model) and
+times one full script rerun for chat histories of growing length.
+
+The RAG system is replaced by a stub and RAG_API_URL is set so app.py
+skips importing torch/FAISS; only rendering cost is measured.
+
+Usage:
+    python notebooks/bench_app_rerun.py --lengths 10 50 200 1000 2>/dev/null
+    python notebooks/bench_app_rerun.py --compare old_app.py   # e.g. from `git show <rev>:app.py`
+
+Results (1 CPU, median of 5 reruns, assistant turns carry 10 programs):
+
+     messages      app.py ms   old app.py ms (re-rendered every bubble)
+           10           56.7           55.7
+           50           60.6           72.2
+          200           36.2          113.1
+         1000           50.3          345.6
+
+Only the last LIVE_MESSAGES bubbles are rebuilt; older turns are one
+pre-rendered markdown block, so rerun time stays flat as sessions grow.
+"""
+
+import argparse
+import os
+import statistics
+import time
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+APP_FILE = Path(__file__).parent.parent / "app.py"
+
+
+class StubRAG:
+    def stats(self):
+        return {'programs': 18596, 'vectors': 18596, 'llm': False, 'llm_provider': None}
+
+
+def fake_history(n_messages: int, k: int = 10) -> list:
+    """Alternating user / assistant turns; assistant turns carry a k-program results record"""
+    programs = [
+        {'program': f"msc program {i}", 'university_name': f"university {i}",
+         'fees': 12000.0 + i, 'duration': "2 years", 'ielts': 6.5, 'toefl': 90.0}
+        for i in range(k)
+    ]
+    messages = []
+    for i in range(n_messages):
+        if i % 2 == 0:
+            messages.append({'role': 'user', 'content': f"question {i} about cheap engineering programs"})
+        else:
+            text = "\n\n".join(f"{j + 1}. {p['program']} at {p['university_name']}" for j, p in enumerate(programs))
+            messages.append({'role': 'assistant', 'content': f"Found {k} programs:\n\n{text}", 'results': programs})
+    return messages
+
+
+def time_rerun(app_file: Path, n_messages: int, repeats: int = 5) -> float:
+    """Median wall time (ms) of a rerun with n_messages of history"""
+    at = AppTest.from_file(str(app_file), default_timeout=60)
+    at.session_state['system_loaded'] = True
+    at.session_state['rag_system'] = StubRAG()
+    at.session_state['messages'] = fake_history(n_messages)
+    at.run()  # first run pays imports / archive building
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - start) * 1000)
+        assert not at.exception, at.exception
+    return statistics.median(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time app.py reruns as chat history grows")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 50, 200, 1000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--compare", type=Path, help="another app.py to time side by side")
+    args = parser.parse_args()
+
+    os.environ.setdefault("RAG_API_URL", "http://stub")
+    os.chdir(APP_FILE.parent)
+
+    apps = [("app.py", APP_FILE)] + ([(args.compare.name, args.compare.resolve())] if args.compare else [])
+    print(f"{'messages':>9} " + " ".join(f"{name + ' ms':>14}" for name, _ in apps))
+    for n in args.lengths:
+        print(f"{n:>9} " + " ".join(f"{time_rerun(path, n, args.repeats):>14.1f}" for _, path in apps))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK: TYPEAHEAD LATENCY
+suggest() latency of autocomplete.AutocompleteIndex over the real catalogue
+names (~18k rows) and over 1M synthetic names built from the same vocabulary.
+
+Queries are typed-so-far prefixes and misspellings of random catalogue names.
+
+Usage:
+    python notebooks/bench_autocomplete.py --synthetic 1000000
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+from autocomplete import AutocompleteIndex, normalize
+
+DATA_FILE = "./data/processed/universities_data.csv"
+
+
+def make_queries(names, count: int, seed: int = 0):
+    """Mix of prefixes (as typed) and misspelled names (one dropped + one swapped char)"""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for name in rng.choice(names, count):
+        name = normalize(name)
+        if rng.random() < 0.5:
+            queries.append(name[:rng.integers(2, max(3, len(name)))])
+        else:
+            chars = list(name)
+            if len(chars) > 4:
+                del chars[rng.integers(1, len(chars) - 1)]
+                i = rng.integers(1, len(chars) - 1)
+                chars[i], chars[i + 1] = chars[i + 1], chars[i]
+            queries.append("".join(chars))
+    return queries
+
+
+def synthetic_names(vocab, count: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(2, 8, count)
+    words = rng.choice(vocab, lengths.sum())
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    return [" ".join(words[bounds[i]:bounds[i + 1]]) for i in range(count)]
+
+
+def bench(label: str, names, n_queries: int):
+    start = time.time()
+    index = AutocompleteIndex(names)
+    build_s = time.time() - start
+
+    queries = make_queries(index.names, n_queries)
+    for q in queries[:50]:
+        index.suggest(q, 5)
+    samples = []
+    for q in queries:
+        t = time.perf_counter()
+        index.suggest(q, 5)
+        samples.append((time.perf_counter() - t) * 1000)
+    samples.sort()
+    print(f"{label:>10} {len(index):>10,} {build_s:>8.1f} {statistics.median(samples):>8.3f} "
+          f"{samples[int(len(samples) * 0.95)]:>8.3f} {samples[int(len(samples) * 0.99)]:>8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Typeahead suggest() latency")
+    parser.add_argument("--synthetic", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    data = pd.read_csv(DATA_FILE)
+    real = list(data['program'].dropna().astype(str)) + list(data['university_name'].dropna().astype(str))
+    vocab = sorted({w for name in real for w in normalize(name).split()})
+
+    print(f"{'catalogue':>10} {'names':>10} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    bench("real", real, args.queries)
+    bench("synthetic", synthetic_names(vocab, args.synthetic), args.queries)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK: COMPRESSED EMBEDDING STORAGE
+Memory and recall@k of the storage modes in 03_faiss_index.py on
+synthetic catalogues that are N x the size of universities_data.csv.
+
+Synthetic vectors are unit-normalized points around random cluster
+centres (all-MiniLM-L6-v2 embeddings are unit length and clustered by
+program family). The base matrix is written to a memory-mapped .npy so
+the 100x run does not need it in RAM; ground truth is exact brute force
+over that file in blocks.
+
+Usage:
+    python notebooks/bench_compressed_index.py --scales 10 100 --queries 200
+
+Results (1 CPU, k=10, rerank factor 4; 200 queries at 10x, 50 at 100x):
+
+     scale       rows  mode  index MB  B/vec    ms/q  recall  +rerank
+       10x    185,960  flat     285.6   1536   30.71   1.000    1.000
+       10x    185,960  fp16     142.8    768   18.92   1.000    1.000
+       10x    185,960  int8      71.4    384   14.55   0.966    1.000
+       10x    185,960    pq       9.3     50    2.65   0.161    0.349
+      100x  1,859,600  flat     2,856   1536       -   1.000        -
+      100x  1,859,600  fp16   1,428.2    768  193.48   1.000    1.000
+      100x  1,859,600  int8     714.1    384  147.50   0.970    1.000
+      100x  1,859,600    pq      89.7     48   31.58   0.122    0.254
+
+int8 + re-ranking keeps exact recall at 1/4 of the RAM. PQ needs a wider
+candidate pool on this (deliberately hard, near-isotropic) synthetic data:
+at 10x, pq_m=96 with RAG_RERANK_FACTOR=20 reaches 0.94 recall@10.
+"""
+
+import argparse
+import importlib.util
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+NOTEBOOKS_DIR = Path(__file__).parent
+BASE_ROWS = 18_596
+DIMENSION = 384
+
+spec = importlib.util.spec_from_file_location("faiss_index", NOTEBOOKS_DIR / "03_faiss_index.py")
+faiss_index = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(faiss_index)
+
+
+def synthetic_embeddings(path: str, n: int, d: int = DIMENSION, clusters: int = 2000,
+                         noise: float = 0.6, block: int = 200_000, seed: int = 0) -> np.ndarray:
+    """Write n clustered unit vectors to a .npy file and return it memory-mapped"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, d)).astype('float32')
+    out = np.lib.format.open_memmap(path, mode='w+', dtype='float32', shape=(n, d))
+    for start in range(0, n, block):
+        size = min(block, n - start)
+        x = centres[rng.integers(0, clusters, size)] + noise * rng.standard_normal((size, d)).astype('float32')
+        out[start:start + size] = x / np.linalg.norm(x, axis=1, keepdims=True)
+    out.flush()
+    return np.load(path, mmap_mode='r')
+
+
+def exact_knn(base: np.ndarray, queries: np.ndarray, k: int, block: int = 200_000):
+    """Brute-force top-k over a memory-mapped base, one block at a time"""
+    best_d = np.full((len(queries), k), np.inf, dtype='float32')
+    best_i = np.full((len(queries), k), -1, dtype='int64')
+    for start in range(0, len(base), block):
+        d, i = faiss.knn(queries, np.ascontiguousarray(base[start:start + block]), k)
+        all_d = np.hstack([best_d, d])
+        all_i = np.hstack([best_i, i + start])
+        order = np.argsort(all_d, axis=1)[:, :k]
+        best_d = np.take_along_axis(all_d, order, axis=1)
+        best_i = np.take_along_axis(all_i, order, axis=1)
+    return best_i
+
+
+def rerank(base: np.ndarray, queries: np.ndarray, candidates: np.ndarray, k: int) -> np.ndarray:
+    """Same exact re-ranking as RAGChatbotWithGoogle._rerank"""
+    safe = np.clip(candidates, 0, None)
+    unique_ids, inverse = np.unique(safe, return_inverse=True)
+    vectors = np.asarray(base[unique_ids], dtype='float32')[inverse.reshape(safe.shape)]
+    exact = ((vectors - queries[:, None, :]) ** 2).sum(axis=2)
+    exact[candidates < 0] = np.inf
+    order = np.argsort(exact, axis=1)[:, :k]
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f[:k]) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def run(scales, modes, n_queries: int, k: int, rerank_factor: int, workdir: str, pq_m: int = 48):
+    print(f"{'scale':>6} {'rows':>10} {'mode':>5} {'index MB':>9} {'B/vec':>6} {'build s':>8} "
+          f"{'ms/q':>7} {'recall':>7} {'+rerank':>8} {'rerank ms/q':>11}")
+
+    for scale in scales:
+        n = BASE_ROWS * scale
+        path = os.path.join(workdir, f"synthetic_{scale}x.npy")
+        base = synthetic_embeddings(path, n)
+        # Queries are perturbed catalogue vectors, like real queries near real programs
+        rng = np.random.default_rng(1)
+        queries = np.asarray(base[rng.integers(0, n, n_queries)]) \
+            + 0.3 * rng.standard_normal((n_queries, DIMENSION)).astype('float32')
+        queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype('float32')
+        truth = exact_knn(base, queries, k)
+
+        for mode in modes:
+            if mode == 'flat' and n * DIMENSION * 4 > 1.5e9:
+                print(f"{scale:>5}x {n:>10,} {mode:>5} {n * DIMENSION * 4 / 1e6:>9,.0f} {DIMENSION * 4:>6}"
+                      f" {'-':>8} {'-':>7} {1.0:>7.3f} {'-':>8} {'-':>11}  (exact, not built)")
+                continue
+            start = time.time()
+            index = faiss_index.train_and_add(faiss_index.make_index(DIMENSION, mode, pq_m=pq_m), base)
+            build_s = time.time() - start
+            size = len(faiss.serialize_index(index))
+
+            start = time.time()
+            _, found = index.search(queries, k)
+            ms_q = (time.time() - start) * 1000 / n_queries
+
+            if mode == 'flat':
+                reranked, rr_ms = found, 0.0
+            else:
+                start = time.time()
+                _, candidates = index.search(queries, k * rerank_factor)
+                reranked = rerank(base, queries, candidates, k)
+                rr_ms = (time.time() - start) * 1000 / n_queries
+
+            print(f"{scale:>5}x {n:>10,} {mode:>5} {size / 1e6:>9,.1f} {size / n:>6.0f} {build_s:>8.1f} "
+                  f"{ms_q:>7.2f} {recall(found, truth):>7.3f} {recall(reranked, truth):>8.3f} {rr_ms:>11.2f}")
+            del index
+
+        del base
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory / recall of compressed FAISS storage modes")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--modes", nargs="+", default=list(faiss_index.STORAGE_MODES))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--pq-m", type=int, default=48, help="PQ sub-vectors (bytes per vector)")
+    parser.add_argument("--workdir", default=tempfile.gettempdir())
+    args = parser.parse_args()
+
+    run(args.scales, args.modes, args.queries, args.k, args.rerank_factor, args.workdir, args.pq_m)
@@ -0,0 +1,444 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+FACETED AGGREGATES OVER THE WHOLE CATALOGUE
+"Cheapest engineering programs", "compare CS masters" or "under $10k" need
+ranking / aggregation over every row, not the 5 nearest neighbours. Built
+once at index-build time (03_faiss_index.py -> facets.npz):
+
+    per row      program family, degree level, university code and
+                 fees / IELTS / TOEFL as float32 (missing, 0 or placeholder
+                 fees below MIN_FEES -> NaN)
+    orderings    row ids sorted by fees, IELTS and TOEFL (unknowns last),
+                 so "cheapest X" is one boolean mask over a sorted array
+    groups       per (family, level) aggregates, with -1 meaning "any":
+                 count, universities, min / median / max fees, IELTS and
+                 TOEFL ranges
+    universities the same aggregates per (university, family, level), sorted
+                 by min fees inside each (family, level) slice
+
+FacetIndex.plan() turns a query into filters / a sort key (or None) using
+query-side patterns (free text, not programme titles) and
+FacetIndex.describe() answers it from the arrays; the LLM only rephrases.
+"""
+
+import hashlib
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+ANY = -1
+
+# First match wins, so narrower families come before broad ones
+FAMILIES = [
+    ('computer science', r'computer|computing|software|data science|data analytics|artificial intelligence|'
+                         r'machine learning|cyber|information technology|information systems|\bcse\b'),
+    ('engineering', r'engineer|\bb\.? ?tech|\bm\.? ?tech|\bb\.?e\b|\bbeng\b|\bmeng\b|mechanical|electrical|'
+                    r'civil|electronic|mechatronic|aerospace|robotic'),
+    ('business', r'business|\bmba\b|\bbba\b|\bbms\b|management|commerce|marketing|finance|accounting|'
+                 r'economics|\bpgdm\b|entrepreneur|hospitality|tourism'),
+    ('medicine & health', r'medic|health|nursing|pharma|dental|dentistry|nutrition|physiotherapy|therapy|'
+                          r'biomedical|midwifery|veterinary'),
+    ('law', r'\blaw\b|\bllb\b|\bllm\b|legal|criminology|criminal justice'),
+    ('education', r'education|teaching|childhood|pedagogy'),
+    ('social sciences', r'psychology|sociology|politic|international relations|anthropology|social work|'
+                        r'geography|public policy|public administration'),
+    ('humanities', r'history|philosophy|english|literature|language|linguistics|spanish|french|german|'
+                   r'theology|religio|classics|translation'),
+    ('arts & design', r'design|fine art|visual art|\bart\b|music|film|theatre|media|fashion|architecture|'
+                      r'photography|animation|creative|journalism|communication'),
+    ('natural sciences', r'biology|chemistry|physics|mathematics|statistics|biochemistry|environmental|'
+                         r'geology|ecology|science'),
+]
+LEVELS = [
+    ('doctorate', r'\bph\.? ?d|doctor|\bdphil\b|doctorate'),
+    ('master', r'\bmaster|\bmsc\b|\bma\b|\bms\b|\bmba\b|\bmeng\b|\bm\.? ?tech|\bllm\b|\bmres\b|\bmlitt\b|'
+               r'\bmphil\b'),
+    ('bachelor', r'\bbachelor|\bbsc\b|\bba\b|\bbs\b|\bbeng\b|\bb\.? ?tech|\bb\.?e\b|\bbba\b|\bbms\b|\bllb\b|'
+                 r'\bbfa\b|undergrad|\bhons\b'),
+    # PG diplomas / PGDM are postgraduate but not master's degrees
+    ('diploma', r'diploma|certificate|\bpgd\w*'),
+]
+FAMILY_NAMES = ['other'] + [name for name, _ in FAMILIES]
+LEVEL_NAMES = ['other'] + [name for name, _ in LEVELS]
+
+# Query-side patterns. Free text is not a programme title: "would be the
+# cheapest" must not read as a B.E., "computer science" must not add natural
+# sciences and "taught in english" must not mean humanities. A family
+# pattern consumes an optional trailing head noun ("computer engineering",
+# "data science"), so one phrase never counts towards two families.
+_HEAD = r'(?:\s+(?:sciences?|engineering|studies|technology|management))?'
+QUERY_FAMILIES = [
+    ('computer science', r'(?:computer|computing|software|data science|data analytics|artificial intelligence|'
+                         r'machine learning|cyber ?security|information technology|information systems|'
+                         r'\bcse\b|\bcs\b|\bai\b)' + _HEAD),
+    ('engineering', r'\bengineer\w*|\bb\.? ?tech\b|\bm\.? ?tech\b|\bb\.e\.?(?!\w)|\bbeng\b|\bmeng\b|'
+                    r'(?:mechanical|electrical|civil|electronics?|mechatronics?|aerospace|robotics?)' + _HEAD),
+    ('business', r'(?:business|\bmba\b|\bbba\b|\bbms\b|management|commerce|marketing|finance|accounting|'
+                 r'economics|\bpgdm\b|entrepreneurship|hospitality|tourism)' + _HEAD),
+    ('medicine & health', r'(?:\bmedicine\b|\bmedical\b|health|nursing|pharma\w*|dental|dentistry|nutrition|'
+                          r'physiotherapy|biomedical|midwifery|veterinary)' + _HEAD),
+    ('law', r'\blaw\b|\bllb\b|\bllm\b|\blegal studies\b|criminology|criminal justice'),
+    ('education', r'\beducation\b|\bteaching\b|\bteacher training\b|early childhood|pedagogy'),
+    ('social sciences', r'psychology|sociology|political science|\bpolitics\b|international relations|'
+                        r'anthropology|social work|geography|public policy|public administration|social sciences?'),
+    ('humanities', r'humanities|history|philosophy|literature|linguistics|theology|religious studies|classics|'
+                   r'translation|(?:english|spanish|french|german|chinese|japanese) (?:studies|literature)'),
+    ('arts & design', r'\bdesign\b|fine arts?|visual arts?|\barts? (?:and|&) design\b|\bmusic\b|\bfilm\b|theatre|'
+                      r'\bmedia\b|fashion|architecture|photography|animation|journalism'),
+    ('natural sciences', r'biology|chemistry|physics|mathematics|\bmaths?\b|statistics|biochemistry|'
+                         r'environmental science|geology|ecology|natural sciences?|life sciences?'),
+]
+QUERY_LEVELS = [
+    ('doctorate', r'\bph\.? ?d|\bdoctoral\b|\bdoctorate\b|\bdphil\b'),
+    ('master', r"\bmasters?\b|\bmaster's|\bmsc\b|\bms\b|\bmba\b|\bmeng\b|\bm\.? ?tech\b|\bllm\b|\bmres\b|"
+               r"\bmphil\b|\bpostgraduate degree"),
+    ('bachelor', r"\bbachelors?\b|\bbachelor's|\bbsc\b|\bba\b|\bbs\b|\bbeng\b|\bb\.? ?tech\b|\bb\.e\.?(?!\w)|"
+                 r"\bbba\b|\bbms\b|\bllb\b|\bbfa\b|undergrad"),
+    ('diploma', r'\bdiplomas?\b|\bcertificates?\b|\bpgd\w*'),
+]
+# A narrower family makes these broader ones redundant unless the user is
+# explicitly comparing them ("compare computer science and engineering")
+BROADER = {
+    'computer science': ('engineering', 'natural sciences'),
+    'medicine & health': ('natural sciences',),
+}
+
+STATS = ('count', 'universities', 'fees_min', 'fees_median', 'fees_max',
+         'ielts_min', 'ielts_max', 'toefl_min', 'toefl_max')
+SORTS = ('fees', 'ielts', 'toefl')
+# Scraped placeholders ($0.01, $1...) would always win "cheapest"
+MIN_FEES = 50.0
+
+_NON_ASCII = re.compile(r'[^\x00-\x7f]')
+_SORT_PATTERNS = [
+    ('ielts', re.compile(r'\b(?:low(?:est)?|easy|easier|minimum|min)\s+ielts\b|\bielts\b.*\b(?:low|easy)\b')),
+    ('toefl', re.compile(r'\b(?:low(?:est)?|easy|easier|minimum|min)\s+toefl\b|\btoefl\b.*\b(?:low|easy)\b')),
+    ('fees', re.compile(r'\bcheap|\baffordable\b|\binexpensive\b|\bbudget\b|\blow(?:est)?\s+(?:cost|fees?|tuition|price)')),
+]
+_SCORE = r'(\d{1,3}(?:\.\d)?)'
+_IELTS_MAX = re.compile(r'\bielts\s*(?:score\s*)?(?:of\s*|under\s*|below\s*|<=?\s*|max(?:imum)?\s*|up to\s*)?' + _SCORE
+                        + r'|' + _SCORE + r'\s*(?:or less\s*)?(?:in\s*)?ielts\b')
+_TOEFL_MAX = re.compile(r'\btoefl\s*(?:score\s*)?(?:of\s*|under\s*|below\s*|<=?\s*|max(?:imum)?\s*|up to\s*)?(\d{2,3})'
+                        r'|(\d{2,3})\s*(?:or less\s*)?(?:in\s*)?toefl\b')
+_FEES_MAX = re.compile(r'(?:under|below|less than|cheaper than|max(?:imum)?|up to|within|<=?)\s*'
+                       r'(\$|usd\s*)?([\d][\d,]*(?:\.\d+)?)\s*(k|thousand)?\b'
+                       r'|(\$)\s*([\d][\d,]*(?:\.\d+)?)\s*(k|thousand)?\s*(?:budget|max|or less)')
+
+
+def _codes(texts: pd.Series, patterns) -> np.ndarray:
+    """Code of the first matching pattern per text (0 = no match)"""
+    codes = np.zeros(len(texts), dtype=np.int8)
+    for code, (_, pattern) in enumerate(patterns, start=1):
+        unassigned = codes == 0
+        if not unassigned.any():
+            break
+        hits = texts[unassigned].str.contains(pattern, regex=True).to_numpy(dtype=bool)
+        codes[np.flatnonzero(unassigned)[hits]] = code
+    return codes
+
+
+def catalogue_fingerprint(data: pd.DataFrame) -> str:
+    """Hash of the columns the facets are built from; a stale facets.npz won't match"""
+    frame = pd.DataFrame({
+        'program': data['program'].astype(str),
+        'university_name': data['university_name'].astype(str),
+        **{col: pd.to_numeric(data[col], errors='coerce').astype('float64') for col in SORTS}
+    })
+    return hashlib.sha1(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes()).hexdigest()
+
+
+def _known(values: pd.Series, floor: float = 0.0) -> np.ndarray:
+    values = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64')
+    return np.where(values > floor, values, np.nan).astype('float32')
+
+
+def _money(value: float) -> str:
+    return "N/A" if np.isnan(value) else f"${value:,.0f}"
+
+
+def _span(low: float, high: float, fmt: str = "{:g}") -> str:
+    if np.isnan(low):
+        return "N/A"
+    return fmt.format(low) if low == high else f"{fmt.format(low)}–{fmt.format(high)}"
+
+
+class FacetIndex:
+    """Compact arrays for catalogue-wide filters, orderings and aggregates"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+        for name, values in arrays.items():
+            setattr(self, name, values)
+        self.university_names = [str(n) for n in arrays['university_names']]
+        self.fingerprint = str(arrays['fingerprint']) if 'fingerprint' in arrays else None
+
+    def __len__(self) -> int:
+        return len(self.family)
+
+    # ------------------------------------------------------------------ build
+
+    @classmethod
+    def build(cls, data: pd.DataFrame) -> "FacetIndex":
+        programs = data['program'].fillna('').astype(str).str.lower().str.replace(_NON_ASCII, '', regex=True)
+        university, names = pd.factorize(data['university_name'].fillna('unknown').astype(str))
+        rows = pd.DataFrame({
+            'family': _codes(programs, FAMILIES).astype(np.int16),
+            'level': _codes(programs, LEVELS).astype(np.int16),
+            'university': university.astype(np.int32),
+            'fees': _known(data['fees'], MIN_FEES),
+            'ielts': _known(data['ielts']),
+            'toefl': _known(data['toefl']),
+        })
+
+        arrays = {col: rows[col].to_numpy() for col in rows.columns}
+        arrays['university_names'] = np.asarray(names, dtype=str)
+        arrays['fingerprint'] = np.asarray(catalogue_fingerprint(data))
+        for key in SORTS:
+            # Stable argsort puts NaN (unknown) last
+            arrays[f'order_{key}'] = np.argsort(rows[key].to_numpy(), kind='stable').astype(np.int32)
+
+        # Each row also counts towards the "any family" / "any level" groups
+        expanded = pd.concat([
+            rows,
+            rows.assign(family=np.int16(ANY)),
+            rows.assign(level=np.int16(ANY)),
+            rows.assign(family=np.int16(ANY), level=np.int16(ANY)),
+        ], ignore_index=True)
+
+        groups = cls._aggregate(expanded, ['family', 'level'])
+        for col in groups.columns:
+            arrays[f'g_{col}'] = groups[col].to_numpy()
+
+        per_university = cls._aggregate(expanded, ['family', 'level', 'university'])
+        per_university = per_university.sort_values(['family', 'level', 'fees_min'], na_position='last', kind='stable')
+        for col in per_university.columns:
+            arrays[f'u_{col}'] = per_university[col].to_numpy()
+        arrays['u_key'] = cls._key(arrays['u_family'], arrays['u_level'])
+        return cls(arrays)
+
+    @staticmethod
+    def _aggregate(frame: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+        grouped = frame.groupby(keys, sort=True)
+        out = grouped.agg(
+            count=('fees', 'size'),
+            universities=('university', 'nunique'),
+            fees_min=('fees', 'min'),
+            fees_median=('fees', 'median'),
+            fees_max=('fees', 'max'),
+            ielts_min=('ielts', 'min'),
+            ielts_max=('ielts', 'max'),
+            toefl_min=('toefl', 'min'),
+            toefl_max=('toefl', 'max'),
+        ).reset_index()
+        for col in keys:
+            out[col] = out[col].astype(np.int32 if col == 'university' else np.int16)
+        for col in STATS:
+            out[col] = out[col].astype(np.int32 if col in ('count', 'universities') else np.float32)
+        return out
+
+    @staticmethod
+    def _key(family, level) -> np.ndarray:
+        return (np.asarray(family, dtype=np.int32) + 1) * (len(LEVEL_NAMES) + 1) + (np.asarray(level, dtype=np.int32) + 1)
+
+    def save(self, path: str):
+        np.savez(path, **self.arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "FacetIndex":
+        with np.load(path, allow_pickle=False) as f:
+            return cls({name: f[name] for name in f.files})
+
+    # ------------------------------------------------------------------ query
+
+    def plan(self, query: str, intent: str) -> Optional[Dict]:
+        """
+        Filters / sort / comparison groups for an aggregate question, or None
+        when the query is better served by plain retrieval
+        """
+        text = _NON_ASCII.sub('', query.lower())
+        families = self._query_families(text, intent)
+        levels = [LEVEL_NAMES.index(name) for name, pattern in QUERY_LEVELS if re.search(pattern, text)]
+
+        plan = {
+            'families': families, 'levels': levels,
+            'max_fees': None, 'max_ielts': None, 'max_toefl': None,
+            'sort': None, 'intent': intent
+        }
+        match = _IELTS_MAX.search(text)
+        if match and float(match.group(1) or match.group(2)) <= 9:
+            plan['max_ielts'] = float(match.group(1) or match.group(2))
+            text = text.replace(match.group(0), ' ')
+        match = _TOEFL_MAX.search(text)
+        if match:
+            plan['max_toefl'] = float(match.group(1) or match.group(2))
+            text = text.replace(match.group(0), ' ')
+        match = _FEES_MAX.search(text)
+        if match:
+            dollar, number, thousand = (match.group(1), match.group(2), match.group(3)) if match.group(2) \
+                else (match.group(4), match.group(5), match.group(6))
+            value = float(number.replace(',', '')) * (1000 if thousand else 1)
+            if dollar or thousand or value >= 100:
+                plan['max_fees'] = value
+        for key, pattern in _SORT_PATTERNS:
+            if pattern.search(text):
+                plan['sort'] = key
+                break
+        if plan['sort'] is None and plan['max_fees'] is not None:
+            plan['sort'] = 'fees'
+
+        ranking = plan['sort'] is not None or any(plan[c] is not None for c in ('max_fees', 'max_ielts', 'max_toefl'))
+        grouped = bool(families or levels)
+        if ranking or (intent in ('comparison', 'recommendation') and grouped):
+            return plan
+        return None
+
+    @staticmethod
+    def _query_families(text: str, intent: str) -> List[int]:
+        """Family codes named in a query; each matched phrase is consumed so it counts once"""
+        names = []
+        for name, pattern in QUERY_FAMILIES:
+            text, matched = re.subn(pattern, ' ', text)
+            if matched:
+                names.append(name)
+        if intent != 'comparison':
+            broader = {b for name in names for b in BROADER.get(name, ())}
+            names = [name for name in names if name not in broader]
+        return [FAMILY_NAMES.index(name) for name in names]
+
+    def mask(self, plan: Dict) -> np.ndarray:
+        """Rows matching the plan's family / level / maximum filters"""
+        keep = np.ones(len(self), dtype=bool)
+        if plan['families']:
+            keep &= np.isin(self.family, plan['families'])
+        if plan['levels']:
+            keep &= np.isin(self.level, plan['levels'])
+        for key in SORTS:
+            limit = plan[f'max_{key}']
+            if limit is not None:
+                keep &= getattr(self, key) <= limit  # NaN compares False: unknown values drop out
+        return keep
+
+    def ranked(self, plan: Dict, k: int, key: Optional[str] = None) -> np.ndarray:
+        """Top-k row ids inside the plan's filters by `key` (default: plan sort, then fees)"""
+        key = key or plan['sort'] or 'fees'
+        order = getattr(self, f'order_{key}')
+        keep = self.mask(plan) & ~np.isnan(getattr(self, key))
+        return order[keep[order]][:k].astype(np.int64)
+
+    def group(self, family: int = ANY, level: int = ANY) -> Optional[Dict]:
+        hit = np.flatnonzero((self.g_family == family) & (self.g_level == level))
+        if not len(hit):
+            return None
+        return {stat: getattr(self, f'g_{stat}')[hit[0]] for stat in STATS}
+
+    def stats(self, keep: np.ndarray) -> Optional[Dict]:
+        """The same aggregates for an arbitrary row mask (filters the tables can't key on)"""
+        rows = np.flatnonzero(keep)
+        if not len(rows):
+            return None
+        out = {'count': len(rows), 'universities': len(np.unique(self.university[rows]))}
+        for key in SORTS:
+            values = getattr(self, key)[rows]
+            values = values[~np.isnan(values)]
+            low, high = (values.min(), values.max()) if len(values) else (np.nan, np.nan)
+            out[f'{key}_min'], out[f'{key}_max'] = low, high
+            if key == 'fees':
+                out['fees_median'] = np.median(values) if len(values) else np.nan
+        return out
+
+    def top_universities(self, family: int = ANY, level: int = ANY, n: int = 5) -> List[Dict]:
+        """Universities in one (family, level) slice, cheapest minimum fees first"""
+        key = self._key(family, level)
+        lo, hi = np.searchsorted(self.u_key, key, 'left'), np.searchsorted(self.u_key, key, 'right')
+        rows = range(lo, min(hi, lo + n))
+        return [
+            dict({'university': self.university_names[self.u_university[r]]},
+                 **{stat: getattr(self, f'u_{stat}')[r] for stat in STATS})
+            for r in rows
+        ]
+
+    # --------------------------------------------------------------- answers
+
+    def _label(self, family: int, level: int) -> str:
+        family_name = "All programs" if family == ANY else FAMILY_NAMES[family].capitalize()
+        return family_name if level == ANY else f"{family_name} · {LEVEL_NAMES[level]}"
+
+    def _group_line(self, plan: Dict, family: int, level: int) -> str:
+        if any(plan[f'max_{key}'] is not None for key in SORTS):
+            stats = self.stats(self.mask(dict(plan, families=[] if family == ANY else [family],
+                                                   levels=[] if level == ANY else [level])))
+        else:
+            stats = self.group(family, level)
+        return self._stats_lines(self._label(family, level), stats)
+
+    @staticmethod
+    def _stats_lines(label: str, stats: Optional[Dict]) -> str:
+        if stats is None:
+            return f"{label}: no programs"
+        return (
+            f"{label}: {stats['count']:,} programs at {stats['universities']:,} universities\n"
+            f"   Fees: min {_money(stats['fees_min'])} · median {_money(stats['fees_median'])} · "
+            f"max {_money(stats['fees_max'])}\n"
+            f"   IELTS: {_span(stats['ielts_min'], stats['ielts_max'], '{:.1f}')} · "
+            f"TOEFL: {_span(stats['toefl_min'], stats['toefl_max'], '{:.0f}')}"
+        )
+
+    def _filters_line(self, plan: Dict, matched: int) -> str:
+        parts = []
+        if plan['families']:
+            parts.append(" / ".join(FAMILY_NAMES[f] for f in plan['families']))
+        if plan['levels']:
+            parts.append(" / ".join(LEVEL_NAMES[lv] for lv in plan['levels']))
+        for key, label, fmt in (('max_fees', 'fees ≤', _money), ('max_ielts', 'IELTS ≤', '{:g}'.format),
+                                ('max_toefl', 'TOEFL ≤', '{:g}'.format)):
+            if plan[key] is not None:
+                parts.append(f"{label} {fmt(plan[key])}")
+        scope = ", ".join(parts) if parts else "whole catalogue"
+        return f"{matched:,} programs in the catalogue match ({scope})"
+
+    def describe(self, plan: Dict, k: int = 5) -> Dict:
+        """
+        Answer a plan from the arrays
+        Returns {'facts': str, 'indices': row ids to show (None = let retrieval
+        pick inside the filters), 'pool': ranked ids for follow-ups}
+        """
+        families = plan['families'] or [ANY]
+        levels = plan['levels'] or [ANY]
+        keep = self.mask(plan)
+        lines = [self._filters_line(plan, int(keep.sum()))]
+
+        if plan['intent'] == 'comparison' and (len(families) > 1 or len(levels) > 1):
+            # Side by side: one aggregate block per (family, level) combination
+            lines += [self._group_line(plan, f, lv) for f in families for lv in levels]
+            per_group = max(1, k // (len(families) * len(levels)))
+            indices = np.concatenate([
+                self.ranked(dict(plan, families=[] if f == ANY else [f], levels=[] if lv == ANY else [lv]), per_group)
+                for f in families for lv in levels
+            ])
+        elif len(families) > 1 or len(levels) > 1:
+            # Several families / levels named without asking for a comparison:
+            # one block over the same union the filter line counts
+            label = " / ".join(self._label(f, lv) for f in families for lv in levels)
+            lines.append(self._stats_lines(label, self.stats(keep)))
+            indices = self.ranked(plan, k) if plan['sort'] else None
+        else:
+            family, level = families[0], levels[0]
+            lines.append(self._group_line(plan, family, level))
+            if plan['intent'] == 'comparison':
+                universities = self.top_universities(family, level, n=5)
+                if universities:
+                    lines.append("Universities with the lowest fees in this group:")
+                    lines += [
+                        f"   {i + 1}. {u['university']}: {u['count']} programs, fees from {_money(u['fees_min'])} "
+                        f"(median {_money(u['fees_median'])}), IELTS {_span(u['ielts_min'], u['ielts_max'], '{:.1f}')}"
+                        for i, u in enumerate(universities)
+                    ]
+            indices = self.ranked(plan, k) if plan['sort'] or plan['intent'] == 'comparison' else None
+
+        if plan['sort']:
+            lines.append(f"Programs below are sorted by {plan['sort'].upper() if plan['sort'] != 'fees' else 'fees'} "
+                         f"(lowest first)")
+        return {'facts': "\n".join(lines), 'indices': indices, 'pool': self.ranked(plan, 50)}
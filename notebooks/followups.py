@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+FOLLOW-UP QUERY PARSING
+Recognises the three kinds of follow-up the RAG system can answer from the
+previous turn's retrieval state instead of embedding the message on its own:
+
+    ordinals    "compare the first two", "tell me more about #3", "the last one"
+                -> positions in the previously shown results (no search at all)
+    refinements "cheaper ones?", "lower ielts", "the cheapest"
+                -> re-filter / re-sort the previous candidate pool
+    references  "what about in canada?", "and those with scholarships"
+                -> blend the new query vector with the previous one
+
+Ordinals and conversational openers ("so", "only", "and") count only when
+nothing but filler is left once they are stripped: "top 10 engineering
+programs in canada" or "what are the first steps to apply" are fresh
+questions. Only explicit back-references ("what about", "those", "them")
+may carry new content, which is what gets blended.
+
+Pure string handling; RAGChatbotWithGoogle.resolve_followup() does the retrieval.
+The catalogue only has the raw duration text, so parse_duration_years() also
+lives here: the RAG system derives the duration_years column the "shorter
+ones" refinements sort on when it loads the data.
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10
+}
+ORDINAL_WORDS = {
+    'first': 1, 'second': 2, 'third': 3, 'fourth': 4, 'fifth': 5,
+    'sixth': 6, 'seventh': 7, 'eighth': 8, 'ninth': 9, 'tenth': 10
+}
+
+_COUNT = r'(\d+|' + '|'.join(NUMBER_WORDS) + r')'
+_ORDINAL = r'(' + '|'.join(ORDINAL_WORDS) + r'|last|\d+(?:st|nd|rd|th))'
+
+# "first two", "top 3", "last two"
+_RANGE = re.compile(r'\b(first|top|last)\s+' + _COUNT + r'\b')
+# "the second", "third one", "2nd", "#2", "number 2", "option 2"
+_SINGLE = re.compile(
+    r'(?:\bthe\s+' + _ORDINAL + r'\b'
+    r'|\b' + _ORDINAL + r'\s+(?:one|program|option|result|university)s?\b'
+    r'|\b(\d+(?:st|nd|rd|th))\b'
+    r'|(?:#|\bnumber\s+|\bno\.?\s*|\boption\s+|\bprogram\s+)(\d+)\b)'
+)
+# "both", "these two", "all of them" -> every shown result (up to n)
+_BOTH = re.compile(r'\b(both|these two|those two|the two)\b')
+_ALL = re.compile(r'\b(all of them|all of these|all of those|them all|these|those|them)\b')
+
+# (pattern, column, mode): 'lower'/'higher' filter against the shown results,
+# 'lowest'/'highest' re-sort the pool by the column
+REFINEMENTS = [
+    (re.compile(r'\b(cheapest|lowest (?:fees?|cost|tuition|price))\b'), 'fees', 'lowest'),
+    (re.compile(r'\b(cheaper|less expensive|more affordable|lower (?:fees?|cost|tuition|price)|on a budget)\b'), 'fees', 'lower'),
+    (re.compile(r'\b(more expensive|pricier|higher (?:fees?|cost|tuition|price))\b'), 'fees', 'higher'),
+    (re.compile(r'\b(lowest ielts)\b'), 'ielts', 'lowest'),
+    (re.compile(r'\b(lower ielts|less ielts|easier english)\b'), 'ielts', 'lower'),
+    (re.compile(r'\b(lowest toefl)\b'), 'toefl', 'lowest'),
+    (re.compile(r'\b(lower toefl|less toefl)\b'), 'toefl', 'lower'),
+    (re.compile(r'\b(shortest)\b'), 'duration_years', 'lowest'),
+    (re.compile(r'\b(shorter|quicker|faster)\b'), 'duration_years', 'lower'),
+]
+
+# Explicit references to the previous results: may carry new content (blend)
+_REFERENCES = re.compile(
+    r'^(?:and |but |so )?(?:what about|how about)\b'
+    r'|\b(?:those|these|them|ones|instead|one of them|of them)\b'
+)
+# Openers that only make a follow-up when nothing else is said ("ok, same again")
+_OPENERS = re.compile(r'^(?:and|also|but|ok|okay|so|same|only)\b|\bsame\b')
+# Words that carry no search content in a follow-up ("show me cheaper ones please")
+_FILLER = {
+    'and', 'also', 'but', 'ok', 'okay', 'so', 'what', 'about', 'how', 'any', 'only', 'show', 'me',
+    'give', 'list', 'find', 'some', 'even', 'more', 'the', 'a', 'an', 'with', 'please', 'ones', 'one',
+    'options', 'option', 'programs', 'program', 'those', 'these', 'them', 'of', 'are', 'there', 'is',
+    'which', 'same', 'instead', 'i', 'want', 'can', 'you', 'now', 'again', 'results', 'universities',
+    'tell', 'details', 'explain', 'describe', 'compare', 'vs', 'versus', 'between', 'difference',
+    'differences', 'to', 'for', 'it', 'its', 'detail', 'info', 'information', 'much', 'does', 'do',
+    'cost', 'costs', 'fees', 'like', 'prefer', 'pick', 'choose', 'better', 'should', 'apply',
+    'requirements', 'top', 'first', 'last'
+}
+_WORDS = re.compile(r"[a-z0-9']+")
+
+
+def parse_duration_years(raw: pd.Series) -> pd.Series:
+    """"4 Years" / "18 Months" / "6 Semesters" / "3 term" -> years as float"""
+    parts = raw.astype('string').str.lower().str.extract(
+        r'(\d+(?:\.\d+)?)\s*(year|yr|month|week|semester|term)?'
+    )
+    value = pd.to_numeric(parts[0], errors='coerce')
+    per_year = parts[1].map({'month': 12, 'week': 52, 'semester': 2, 'term': 3}).fillna(1).astype(float)
+    return value / per_year.to_numpy()
+
+
+def _number(token: str) -> int:
+    token = token.lower()
+    if token in NUMBER_WORDS:
+        return NUMBER_WORDS[token]
+    if token in ORDINAL_WORDS:
+        return ORDINAL_WORDS[token]
+    return int(re.sub(r'(st|nd|rd|th)$', '', token))
+
+
+def _without_ordinals(text: str) -> str:
+    for pattern in (_RANGE, _SINGLE, _BOTH, _ALL):
+        text = pattern.sub(' ', text)
+    return text
+
+
+def parse_ordinals(query: str, shown: int) -> Optional[List[int]]:
+    """
+    0-based positions into the `shown` previous results the query points at,
+    or None (also when anything but filler is left around the ordinal)
+    """
+    text = query.lower()
+    if shown <= 0 or content_words(_without_ordinals(text)):
+        return None
+
+    match = _RANGE.search(text)
+    if match:
+        count = min(_number(match.group(2)), shown)
+        if match.group(1) == 'last':
+            return list(range(shown - count, shown))
+        return list(range(count))
+
+    positions = []
+    for match in _SINGLE.finditer(text):
+        token = next(g for g in match.groups() if g)
+        position = shown - 1 if token == 'last' else _number(token) - 1
+        if 0 <= position < shown and position not in positions:
+            positions.append(position)
+    if positions:
+        return positions
+
+    if _BOTH.search(text):
+        return list(range(min(2, shown)))
+    if _ALL.search(text):
+        return list(range(shown))
+    return None
+
+
+def parse_refinement(query: str) -> Optional[Tuple[str, str, str]]:
+    """(column, mode, matched phrase) for "cheaper ones"-style refinements, or None"""
+    text = query.lower()
+    for pattern, column, mode in REFINEMENTS:
+        match = pattern.search(text)
+        if match:
+            return column, mode, match.group(0)
+    return None
+
+
+def content_words(query: str, drop: str = '') -> List[str]:
+    """Words left once follow-up filler (and the `drop` phrase) is removed"""
+    text = query.lower().replace(drop, ' ') if drop else query.lower()
+    return [w for w in _WORDS.findall(text) if w not in _FILLER]
+
+
+def is_followup(query: str) -> bool:
+    """Cheap check: does the query read like it refers back to the previous turn?"""
+    text = query.lower().strip()
+    if _REFERENCES.search(text):
+        return True
+    if (_RANGE.search(text) or _SINGLE.search(text) or _BOTH.search(text) or _OPENERS.search(text)) \
+            and not content_words(_without_ordinals(text)):
+        return True
+    refinement = parse_refinement(text)
+    return refinement is not None and not content_words(text, refinement[2])
@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+LLM CLIENT LAYER
+Provider-agnostic wrapper used by RAGChatbotWithGoogle for every LLM call.
+
+Providers (one persistent client each, created once and reused):
+    GeminiProvider  - google.generativeai
+    OpenAIProvider  - openai SDK (any OpenAI-compatible base_url)
+    StubProvider    - local, no network; configurable latency / failures
+
+ResilientLLM adds, around any provider:
+    - a per-call deadline covering retries and backoff
+    - jittered exponential retries
+    - a process-wide concurrency semaphore
+    - a circuit breaker (callers fall back to template responses while open)
+    - hedged requests: a second attempt fires if the first is slower than
+      `hedge_after` seconds, and the first success wins
+
+Configuration (env):
+    LLM_PROVIDER          gemini | openai | stub (default: whichever key is set)
+    LLM_MODEL             model name override
+    LLM_TIMEOUT_S         per-call deadline (default 20)
+    LLM_MAX_RETRIES       retries after the first attempt (default 2)
+    LLM_MAX_CONCURRENCY   concurrent in-flight calls (default 8)
+    LLM_HEDGE_AFTER_S     hedge delay, 0 disables (default 0)
+    LLM_STUB_LATENCY      stub latency distribution, see stub_latency()
+"""
+
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterator, Optional
+
+
+class LLMError(Exception):
+    """Any failure of the LLM layer; callers fall back to template responses"""
+
+
+class LLMTimeoutError(LLMError):
+    """The call did not finish within its deadline"""
+
+
+class CircuitOpenError(LLMError):
+    """The circuit breaker is open, the provider is not being called"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    False for client errors (4xx other than 408 / 409 / 429): a bad request or
+    key fails the same way on every retry. openai errors carry `status_code`,
+    google.api_core errors `code`.
+    """
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(error, 'code', None)
+    if isinstance(status, int) and 400 <= status < 500:
+        return status in (408, 409, 429)
+    return True
+
+
+# ============================================================================
+# PROVIDERS
+# ============================================================================
+
+class LLMProvider:
+    """Minimal provider interface: blocking generate + optional streaming"""
+
+    name = "base"
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        yield self.generate(prompt, timeout)
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str = "gemini-2.0-flash-exp"):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model)
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        response = self.model.generate_content(prompt, request_options={'timeout': timeout})
+        return response.text
+
+    def stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        for part in self.model.generate_content(prompt, stream=True, request_options={'timeout': timeout}):
+            text = getattr(part, 'text', '')
+            if text:
+                yield text
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str = "gpt-4o-mini", base_url: Optional[str] = None):
+        from openai import OpenAI
+        # Retries are handled by ResilientLLM, not by the SDK
+        self.client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        self.model = model
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        response = self.client.with_options(timeout=timeout).chat.completions.create(
+            model=self.model,
+            messages=[{'role': 'user', 'content': prompt}]
+        )
+        return response.choices[0].message.content or ""
+
+    def stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        response = self.client.with_options(timeout=timeout).chat.completions.create(
+            model=self.model,
+            messages=[{'role': 'user', 'content': prompt}],
+            stream=True
+        )
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class StubProvider(LLMProvider):
+    """
+    Local provider for development and load tests.
+    `latency` is a callable returning seconds to sleep per call, so tests
+    can inject any distribution; `failure_rate` makes calls raise.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency: Optional[Callable[[], float]] = None, failure_rate: float = 0.0):
+        self.latency = latency or (lambda: 0.0)
+        self.failure_rate = failure_rate
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        delay = self.latency()
+        if delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"stub call exceeded {timeout:.2f}s")
+        time.sleep(delay)
+        if random.random() < self.failure_rate:
+            raise RuntimeError("stub provider failure")
+        programs = prompt.split("Programs", 1)[-1].split(":", 1)[-1].strip()
+        return f"Here are the best matches I found:\n\n{programs}"
+
+
+def stub_latency(spec: str) -> Callable[[], float]:
+    """
+    Latency sampler for StubProvider from a short spec (seconds):
+        none | const:0.5 | uniform:0.2,1.5 | exp:0.8 | lognormal:0.8,0.5
+    lognormal takes the median and sigma of the underlying normal
+    """
+    kind, _, args = (spec or 'none').partition(':')
+    values = [float(v) for v in args.split(',')] if args else []
+    if kind == 'none':
+        return lambda: 0.0
+    if kind == 'const':
+        return lambda: values[0]
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1])
+    if kind == 'exp':
+        return lambda: random.expovariate(1.0 / values[0])
+    if kind == 'lognormal':
+        return lambda: values[0] * math.exp(random.gauss(0.0, values[1]))
+    raise ValueError(f"Unknown latency spec '{spec}'")
+
+
+# ============================================================================
+# RESILIENCE
+# ============================================================================
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures.
+    Open -> half-open after `reset_timeout` seconds, letting one trial call
+    through; its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """The call ended without an outcome (e.g. an abandoned stream): allow a new trial"""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class ResilientLLM:
+    """Deadline / retry / semaphore / breaker / hedging wrapper around a provider"""
+
+    def __init__(self, provider: LLMProvider, timeout: float = 20.0, max_retries: int = 2,
+                 max_concurrency: int = 8, hedge_after: float = 0.0,
+                 backoff_base: float = 0.25, backoff_cap: float = 4.0,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.provider = provider
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker or CircuitBreaker()
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        # Attempts that outlive their deadline keep a thread until the provider
+        # timeout fires, so leave headroom over the concurrency limit
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency * 2,
+                                        thread_name_prefix=f"llm-{provider.name}")
+
+    @property
+    def name(self) -> str:
+        return self.provider.name
+
+    def _attempt(self, prompt: str, deadline: float, blocking: bool = True) -> str:
+        """One provider call holding a semaphore slot"""
+        remaining = deadline - time.monotonic()
+        acquired = self.semaphore.acquire(timeout=remaining) if blocking and remaining > 0 \
+            else self.semaphore.acquire(blocking=False)
+        if not acquired:
+            raise LLMTimeoutError("no free LLM slot before deadline")
+        try:
+            return self.provider.generate(prompt, max(deadline - time.monotonic(), 0.01))
+        finally:
+            self.semaphore.release()
+
+    def _call_once(self, prompt: str, deadline: float) -> str:
+        """One logical attempt, hedged with a second request if it runs slow"""
+        primary = self._pool.submit(self._attempt, prompt, deadline)
+        pending = {primary}
+
+        if self.hedge_after > 0:
+            done, _ = wait(pending, timeout=min(self.hedge_after, max(deadline - time.monotonic(), 0)))
+            if not done and time.monotonic() < deadline:
+                pending.add(self._pool.submit(self._attempt, prompt, deadline, False))
+
+        error: Optional[BaseException] = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        if error is not None and not pending:
+            raise error
+        raise LLMTimeoutError(f"LLM call exceeded {self.timeout:.1f}s deadline")
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Generate text or raise LLMError; never blocks past the deadline"""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        last_error: Optional[BaseException] = None
+
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"{self.name} circuit open")
+            try:
+                text = self._call_once(prompt, deadline)
+                self.breaker.record_success()
+                return text
+            except Exception as e:
+                self.breaker.record_failure()
+                last_error = e
+                if not is_retryable(e):
+                    break
+
+            # Full-jitter exponential backoff, never sleeping past the deadline
+            backoff = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+            if time.monotonic() + backoff >= deadline:
+                break
+            time.sleep(backoff)
+
+        if isinstance(last_error, LLMError):
+            raise last_error
+        if isinstance(last_error, TimeoutError):
+            raise LLMTimeoutError(f"{self.name} timed out: {last_error}") from last_error
+        raise LLMError(f"{self.name} failed: {last_error}") from last_error
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Stream chunks from the provider. Falls back to generate() (with its
+        retries) if the stream fails before producing anything. The slot wait,
+        the stream and the fallback all share one deadline.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        # Take the slot before asking the breaker, so a slot timeout can never
+        # strand a half-open trial
+        if not self.semaphore.acquire(timeout=timeout or self.timeout):
+            raise LLMTimeoutError("no free LLM slot before deadline")
+        if not self.breaker.allow():
+            self.semaphore.release()
+            raise CircuitOpenError(f"{self.name} circuit open")
+
+        produced = False
+        error: Optional[Exception] = None
+        completed = False
+        try:
+            for text in self.provider.stream(prompt, max(deadline - time.monotonic(), 0.0)):
+                produced = True
+                yield text
+            completed = True
+        except Exception as e:
+            error = e
+            if produced:
+                raise LLMError(f"{self.name} stream broke: {e}") from e
+            if not is_retryable(e):
+                raise LLMError(f"{self.name} failed: {e}") from e
+        finally:
+            # Also runs on GeneratorExit when the consumer stops reading, so a
+            # half-open trial is never left in flight
+            self.semaphore.release()
+            if error is not None:
+                self.breaker.record_failure()
+            elif completed or produced:
+                self.breaker.record_success()
+            else:
+                self.breaker.release_trial()
+
+        if not produced:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMTimeoutError(f"{self.name} stream failed with no time left for a retry: {error}")
+            yield self.generate(prompt, remaining)
+
+
+def build_llm_from_env() -> Optional[ResilientLLM]:
+    """Create the configured provider wrapped in ResilientLLM, or None for template mode"""
+    provider_name = os.getenv('LLM_PROVIDER', '').lower()
+    google_key = os.getenv('GOOGLE_API_KEY')
+    openai_key = os.getenv('OPENAI_API_KEY')
+    model = os.getenv('LLM_MODEL')
+
+    if not provider_name:
+        provider_name = 'gemini' if google_key else 'openai' if openai_key else ''
+
+    if provider_name == 'gemini' and google_key:
+        provider = GeminiProvider(google_key, model or "gemini-2.0-flash-exp")
+    elif provider_name == 'openai' and openai_key:
+        provider = OpenAIProvider(openai_key, model or "gpt-4o-mini", os.getenv('OPENAI_BASE_URL'))
+    elif provider_name == 'stub':
+        provider = StubProvider(stub_latency(os.getenv('LLM_STUB_LATENCY', 'none')))
+    else:
+        return None
+
+    return ResilientLLM(
+        provider,
+        timeout=float(os.getenv('LLM_TIMEOUT_S', '20')),
+        max_retries=int(os.getenv('LLM_MAX_RETRIES', '2')),
+        max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', '8')),
+        hedge_after=float(os.getenv('LLM_HEDGE_AFTER_S', '0'))
+    )
+
@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+LOAD TEST: CONCURRENT CHAT USERS AGAINST ONE NODE
+Closed-loop simulated users. Each user sends a query, waits for the answer,
+thinks for an exponential think time and repeats. The test sweeps the
+concurrency levels and reports, per level:
+
+    throughput / latency   completed req/s and p50 / p95 / p99 latency;
+                           requests sent in the window are drained after it
+                           (up to --drain s) so the slowest ones count, and
+                           any still running then are timeouts whose wait so
+                           far enters the percentiles
+    per-stage breakdown    mean ms per request in encode, FAISS search
+                           (+ re-rank), formatting (pandas), LLM, other
+    saturation point       the last level before more users stop adding
+                           throughput, and the stage that grew the most
+
+Targets (everything runs locally, the LLM is the stub provider):
+    inprocess  RAGChatbotWithGoogle.answer() in this process, with the
+               per-stage breakdown
+    http       POST /answer on 06_serve_api.py, end to end only. Start
+               the server with LLM_PROVIDER=stub LLM_STUB_LATENCY=<spec>
+
+Query mix: the sidebar examples, queries built from catalogue rows (or
+--corpus, one query per line), and follow-ups ("cheaper ones?") on the
+user's own session.
+
+Usage:
+    python notebooks/load_test.py --users 1 2 4 8 16 --duration 20 --llm-latency lognormal:0.8,0.5
+    python notebooks/load_test.py --target http --url http://localhost:8000 --users 4 16 64
+"""
+
+import argparse
+import csv
+import importlib.util
+import random
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from llm_client import ResilientLLM, StubProvider, stub_latency
+
+NOTEBOOKS_DIR = Path(__file__).parent
+
+DATA_FILE = "./data/processed/universities_data.csv"
+EMBEDDINGS_FILE = "./data/processed/embeddings.pkl"
+FAISS_INDEX_FILE = "./data/processed/faiss_index.bin"
+
+# Same prompts as the "Try These" buttons in app.py
+SIDEBAR_EXAMPLES = [
+    "Cheap engineering programs",
+    "Best MBA programs",
+    "Compare CS masters",
+    "Low IELTS requirements",
+    "Under $10k universities"
+]
+FOLLOWUPS = [
+    "cheaper ones?",
+    "compare the first two",
+    "what about in canada?",
+    "tell me more about #2"
+]
+STAGES = ('encode', 'search', 'format', 'llm')
+
+
+# ============================================================================
+# QUERY MIX
+# ============================================================================
+
+class QueryMix:
+    """Draws sidebar examples, corpus queries and follow-ups in set proportions"""
+
+    def __init__(self, corpus: List[str], example_share: float = 0.3, followup_share: float = 0.2):
+        self.corpus = corpus
+        self.example_share = example_share
+        self.followup_share = followup_share
+
+    @classmethod
+    def from_catalogue(cls, data_path: str, size: int = 2000, **kwargs) -> "QueryMix":
+        data = pd.read_csv(data_path, usecols=['program', 'university_name']).dropna()
+        rows = data.sample(min(size, len(data)), random_state=0)
+        templates = ["{program} programs", "{program} at {university}", "affordable {program}"]
+        corpus = [
+            random.Random(i).choice(templates).format(program=row.program, university=row.university_name)
+            for i, row in enumerate(rows.itertuples())
+        ]
+        return cls(corpus, **kwargs)
+
+    def next(self, rng: random.Random, has_history: bool) -> str:
+        draw = rng.random()
+        if has_history and draw < self.followup_share:
+            return rng.choice(FOLLOWUPS)
+        if draw < self.followup_share + self.example_share:
+            return rng.choice(SIDEBAR_EXAMPLES)
+        return rng.choice(self.corpus)
+
+
+# ============================================================================
+# TARGETS
+# ============================================================================
+
+class StageClock:
+    """
+    Wraps instance methods of one RAG object so each call adds its wall time
+    to the calling thread's current request; nothing is changed on the class
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def start(self):
+        self._local.stages = defaultdict(float)
+
+    def stop(self) -> Dict[str, float]:
+        return dict(getattr(self._local, 'stages', {}))
+
+    def wrap(self, obj, method: str, stage: str):
+        original = getattr(obj, method)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                stages = getattr(self._local, 'stages', None)
+                if stages is not None:
+                    stages[stage] += time.perf_counter() - start
+
+        setattr(obj, method, timed)
+
+
+class InProcessTarget:
+    """RAGChatbotWithGoogle.answer() in this process, stub LLM, per-stage timings"""
+
+    def __init__(self, llm_latency: str, llm_concurrency: int, k: int):
+        spec = importlib.util.spec_from_file_location("rag_system", NOTEBOOKS_DIR / "05_rag_system.py")
+        rag_module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(rag_module)
+        self.rag = rag_module.RAGChatbotWithGoogle(
+            data_path=DATA_FILE,
+            embeddings_path=EMBEDDINGS_FILE,
+            index_path=FAISS_INDEX_FILE
+        )
+        self.rag.llm = None if llm_latency == 'template' else ResilientLLM(
+            StubProvider(stub_latency(llm_latency)),
+            timeout=60.0,
+            max_concurrency=llm_concurrency
+        )
+        self.k = k
+        self.clock = StageClock()
+        self.clock.wrap(self.rag, 'encode', 'encode')
+        self.clock.wrap(self.rag, 'search_vectors', 'search')
+        self.clock.wrap(self.rag, '_format_programs', 'format')
+        if self.rag.llm is not None:
+            self.clock.wrap(self.rag.llm, 'generate', 'llm')
+
+    def __call__(self, query: str, session: str) -> Dict[str, float]:
+        self.clock.start()
+        result = self.rag.answer(query, k=self.k, session=session)
+        if result['intent'] == 'error':
+            raise RuntimeError(result['response'])
+        return self.clock.stop()
+
+
+class HTTPTarget:
+    """POST /answer on 06_serve_api.py; end-to-end latency only"""
+
+    def __init__(self, url: str, k: int):
+        from rag_client import RemoteRAGClient
+        self.client = RemoteRAGClient(url)
+        self.k = k
+        if not self.client.is_ready():
+            raise RuntimeError(f"{url}/ready is not reporting ready")
+
+    def __call__(self, query: str, session: str) -> Dict[str, float]:
+        self.client.answer(query, k=self.k, session=session)
+        return {}
+
+
+# ============================================================================
+# DRIVER
+# ============================================================================
+
+def run_level(target: Callable, mix: QueryMix, users: int, duration: float,
+              warmup: float, think: float, seed: int = 0, drain: float = 30.0) -> Dict:
+    """
+    Run `users` closed-loop users for warmup + duration seconds; stats cover
+    requests sent in the last `duration`. Requests still in flight at the end
+    are waited for up to `drain` seconds; latency includes them (the ones
+    that never finish as timeouts), throughput counts completions in the window.
+    """
+    records, lock = [], threading.Lock()
+    in_flight: Dict[int, float] = {}
+    closed = False
+    start = time.monotonic()
+    measure_from, stop_at = start + warmup, start + warmup + duration
+
+    def user(uid: int):
+        rng = random.Random(seed * 10_000 + uid)
+        session = f"load-{users}-{uid}"
+        has_history = False
+        while time.monotonic() < stop_at:
+            query = mix.next(rng, has_history)
+            sent = time.monotonic()
+            with lock:
+                in_flight[uid] = sent
+            try:
+                stages, ok = target(query, session), True
+                has_history = True
+            except Exception:
+                stages, ok = {}, False
+            done = time.monotonic()
+            with lock:
+                in_flight.pop(uid, None)
+                if closed:
+                    return
+                if sent >= measure_from:
+                    records.append((done - sent, ok, stages, done <= stop_at))
+            if think > 0:
+                time.sleep(min(rng.expovariate(1.0 / think), max(stop_at - time.monotonic(), 0)))
+
+    threads = [threading.Thread(target=user, args=(uid,), daemon=True) for uid in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(max(stop_at + drain - time.monotonic(), 0))
+    with lock:
+        closed = True
+        now = time.monotonic()
+        # Still running after the drain: their wait so far is a lower bound on latency
+        timed_out = [now - sent for sent in in_flight.values() if sent >= measure_from]
+
+    latencies = np.array([r[0] for r in records if r[1]] + timed_out) * 1000
+    level = {
+        'users': users,
+        'completed': sum(1 for r in records if r[1]),
+        'errors': sum(1 for r in records if not r[1]),
+        'late': sum(1 for r in records if not r[3]),
+        'timeouts': len(timed_out),
+        'throughput': sum(1 for r in records if r[1] and r[3]) / duration,
+        'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else float('nan'),
+        'p95_ms': float(np.percentile(latencies, 95)) if len(latencies) else float('nan'),
+        'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else float('nan'),
+    }
+    ok_stages = [r[2] for r in records if r[1]]
+    for stage in STAGES:
+        level[f"{stage}_ms"] = float(np.mean([s.get(stage, 0.0) for s in ok_stages]) * 1000) \
+            if ok_stages and any(ok_stages) else float('nan')
+    if ok_stages and any(ok_stages):
+        completed = np.array([r[0] for r in records if r[1]]) * 1000
+        level['other_ms'] = float(np.mean(completed)) - sum(level[f"{s}_ms"] for s in STAGES)
+    else:
+        level['other_ms'] = float('nan')
+    return level
+
+
+def find_saturation(levels: List[Dict], min_gain: float = 0.10) -> Optional[Dict]:
+    """
+    Last level whose successor adds less than `min_gain` throughput, plus the
+    stage whose per-request time grew most from the first level up to it
+    """
+    for prev, cur in zip(levels, levels[1:]):
+        if cur['throughput'] < prev['throughput'] * (1 + min_gain):
+            base = levels[0]
+            growth = {
+                stage: cur[f"{stage}_ms"] - base[f"{stage}_ms"]
+                for stage in STAGES + ('other',)
+                if not np.isnan(cur[f"{stage}_ms"])
+            }
+            return {
+                'users': prev['users'],
+                'throughput': prev['throughput'],
+                'bottleneck': max(growth, key=growth.get) if growth else None
+            }
+    return None
+
+
+def print_report(levels: List[Dict]):
+    header = f"{'users':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'err':>5} " \
+             f"{'late':>5} {'tmo':>5} | " + \
+             " ".join(f"{s + ' ms':>10}" for s in STAGES + ('other',))
+    print("\n" + header)
+    print("-" * len(header))
+    for lv in levels:
+        stages = " ".join(
+            f"{'-':>10}" if np.isnan(lv[f'{s}_ms']) else f"{lv[f'{s}_ms']:>10.1f}"
+            for s in STAGES + ('other',)
+        )
+        print(f"{lv['users']:>6} {lv['throughput']:>8.2f} {lv['p50_ms']:>8.0f} {lv['p95_ms']:>8.0f} "
+              f"{lv['p99_ms']:>8.0f} {lv['errors']:>5} {lv['late']:>5} {lv['timeouts']:>5} | {stages}")
+
+    saturation = find_saturation(levels)
+    if saturation:
+        where = f", first stage to grow: {saturation['bottleneck']}" if saturation['bottleneck'] else ""
+        print(f"\n📈 Saturates at ~{saturation['users']} concurrent users "
+              f"({saturation['throughput']:.2f} req/s){where}")
+    else:
+        print("\n📈 No saturation within the tested levels; try more users")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate concurrent chat users against one node")
+    parser.add_argument("--target", choices=("inprocess", "http"), default="inprocess")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds per level")
+    parser.add_argument("--drain", type=float, default=30.0,
+                        help="seconds to wait for requests still in flight after each level")
+    parser.add_argument("--think", type=float, default=1.0, help="mean think time (s) between a user's queries")
+    parser.add_argument("--llm-latency", default="lognormal:0.8,0.5",
+                        help="stub LLM latency spec (see llm_client.stub_latency) or 'template' for no LLM")
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--corpus", help="file with one query per line (default: built from the catalogue)")
+    parser.add_argument("--example-share", type=float, default=0.3)
+    parser.add_argument("--followup-share", type=float, default=0.2)
+    parser.add_argument("--csv", help="write the per-level table here for plotting")
+    args = parser.parse_args()
+
+    print("="*80)
+    print(f"🧪 LOAD TEST ({args.target})")
+    print("="*80)
+
+    shares = {'example_share': args.example_share, 'followup_share': args.followup_share}
+    if args.corpus:
+        with open(args.corpus, 'r', encoding='utf-8') as f:
+            mix = QueryMix([line.strip() for line in f if line.strip()], **shares)
+    else:
+        mix = QueryMix.from_catalogue(DATA_FILE, **shares)
+
+    if args.target == "inprocess":
+        target = InProcessTarget(args.llm_latency, args.llm_concurrency, args.k)
+    else:
+        target = HTTPTarget(args.url, args.k)
+
+    levels = []
+    for users in args.users:
+        print(f"▶ {users} users for {args.warmup:.0f}+{args.duration:.0f}s...")
+        levels.append(run_level(target, mix, users, args.duration, args.warmup, args.think, drain=args.drain))
+    print_report(levels)
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(levels[0]))
+            writer.writeheader()
+            writer.writerows(levels)
+        print(f"💾 Saved curves to: {args.csv}")
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ON-DEMAND PROFILING FOR THE SERVING PATH
+Opt-in: RAG_PROFILE=<N requests> at startup, or the "Start profiling" button
+in the app's System Stats panel. While idle nothing is installed, so the
+serving path runs exactly as without this module. Profiler.start() wraps the
+RAG instance's answer() / answer_stream(). After N requests the wrappers are
+removed and one run directory is written:
+
+    cpu.collapsed   sampled stacks, one "frame;frame;frame count" per line
+                    (flamegraph.pl, speedscope, inferno)
+    cpu.pstats      cProfile stats when mode='cprofile' (snakeviz, pstats)
+    memory.txt      tracemalloc growth between consecutive requests and
+                    over the whole run; leaks show up as lines that keep growing
+    summary.json    per-request latency / traced memory, runtime_info()
+
+Env:
+    RAG_PROFILE         requests to profile at startup (unset = off)
+    RAG_PROFILE_MODE    sample (default) | cprofile
+    RAG_PROFILE_MEMORY  0 disables tracemalloc (default on)
+    RAG_PROFILE_DIR     output root (default ./data/profiles)
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+PROFILE_DIR = os.getenv('RAG_PROFILE_DIR', "./data/profiles")
+PROFILED_METHODS = ('answer', 'answer_stream')
+
+
+def _proc_status() -> Dict[str, str]:
+    try:
+        with open('/proc/self/status', 'r') as f:
+            return dict(line.rstrip('\n').split(':\t', 1) for line in f if ':\t' in line)
+    except OSError:
+        return {}
+
+
+def runtime_info() -> Dict:
+    """Thread pools and memory of this process (torch / FAISS only if already imported)"""
+    status = _proc_status()
+    info = {
+        'python_threads': threading.active_count(),
+        'os_threads': int(status['Threads']) if 'Threads' in status else None,
+        'rss_mb': round(int(status['VmRSS'].split()[0]) / 1024, 1) if 'VmRSS' in status else None,
+        'env': {name: os.getenv(name) for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')}
+    }
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        info['torch_threads'] = torch.get_num_threads()
+        info['torch_interop_threads'] = torch.get_num_interop_threads()
+    faiss = sys.modules.get('faiss')
+    if faiss is not None:
+        info['faiss_omp_threads'] = faiss.omp_get_max_threads()
+    return info
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profiler:
+    """Profiles the next N answer() / answer_stream() calls of one RAG instance"""
+
+    def __init__(self, rag, out_dir: str = PROFILE_DIR):
+        self.rag = rag
+        self.out_dir = out_dir
+        self.lock = threading.Lock()
+        self.active = False
+        self.remaining = 0
+        self.run_dir: Optional[str] = None
+        self.last_run: Optional[str] = None
+
+    # ------------------------------------------------------------- control
+
+    def start(self, requests: int = 20, mode: str = 'sample', memory: bool = True,
+              interval_ms: float = 5.0, memory_frames: int = 10) -> str:
+        """Install the hooks for the next `requests` calls; returns the run directory"""
+        if mode not in ('sample', 'cprofile'):
+            raise ValueError(f"Unknown profiling mode '{mode}', expected 'sample' or 'cprofile'")
+        with self.lock:
+            if self.active:
+                return self.run_dir
+            self.run_dir = os.path.join(self.out_dir, time.strftime("%Y%m%d-%H%M%S") + f"-{time.time_ns() // 1_000_000 % 1000:03d}")
+            os.makedirs(self.run_dir, exist_ok=True)
+            self.mode = mode
+            self.remaining = requests
+            self.records: List[Dict] = []
+            self.samples: Counter = Counter()
+            self.stats: Optional[pstats.Stats] = None
+            self.threads: Dict[int, int] = {}
+            self.cprofile_busy = threading.Lock()
+
+            self.memory = memory
+            self.started_tracing = False
+            if memory:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(memory_frames)
+                    self.started_tracing = True
+                self.first_snapshot = self.last_snapshot = self._snapshot()
+                self.memory_steps: List[str] = []
+
+            self.stop_sampling = threading.Event()
+            if mode == 'sample':
+                self.interval = interval_ms / 1000.0
+                threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True).start()
+
+            for method in PROFILED_METHODS:
+                setattr(self.rag, method, self._wrap(method, getattr(self.rag, method)))
+            self.active = True
+        print(f"🔬 Profiling the next {requests} requests ({mode}{', tracemalloc' if memory else ''}) -> {self.run_dir}")
+        return self.run_dir
+
+    def stop(self) -> Optional[str]:
+        """Remove the hooks now and write whatever was collected"""
+        with self.lock:
+            if not self.active:
+                return None
+            self._finish()
+            return self.last_run
+
+    def status(self) -> Dict:
+        return {
+            'active': self.active,
+            'remaining': self.remaining if self.active else 0,
+            'run_dir': self.run_dir if self.active else None,
+            'last_run': self.last_run,
+            'runtime': runtime_info()
+        }
+
+    # --------------------------------------------------------------- hooks
+
+    def _wrap(self, method: str, original):
+        profiler = self
+
+        if method == 'answer_stream':
+            def profiled_stream(*args, **kwargs):
+                token = profiler._enter()
+                try:
+                    yield from original(*args, **kwargs)
+                finally:
+                    profiler._exit(token, method)
+            return profiled_stream
+
+        def profiled(*args, **kwargs):
+            token = profiler._enter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                profiler._exit(token, method)
+        return profiled
+
+    def _enter(self) -> Dict:
+        token = {'start': time.perf_counter(), 'thread': threading.get_ident(), 'profile': None}
+        if self.mode == 'cprofile':
+            # One cProfile at a time (newer Pythons allow only one active profiler)
+            if self.cprofile_busy.acquire(blocking=False):
+                token['profile'] = cProfile.Profile()
+                token['profile'].enable()
+        else:
+            with self.lock:
+                self.threads[token['thread']] = self.threads.get(token['thread'], 0) + 1
+        return token
+
+    def _exit(self, token: Dict, method: str):
+        elapsed = time.perf_counter() - token['start']
+        if token['profile'] is not None:
+            token['profile'].disable()
+            self.cprofile_busy.release()
+        with self.lock:
+            if not self.active:
+                return
+            if self.mode == 'sample':
+                count = self.threads.get(token['thread'], 1) - 1
+                if count:
+                    self.threads[token['thread']] = count
+                else:
+                    self.threads.pop(token['thread'], None)
+            if token['profile'] is not None:
+                if self.stats is None:
+                    self.stats = pstats.Stats(token['profile'])
+                else:
+                    self.stats.add(token['profile'])
+
+            record = {'request': len(self.records) + 1, 'method': method, 'ms': round(elapsed * 1000, 2)}
+            if self.memory:
+                snapshot = self._snapshot()
+                record['traced_mb'] = round(tracemalloc.get_traced_memory()[0] / 1e6, 2)
+                top = snapshot.compare_to(self.last_snapshot, 'lineno')[:5]
+                self.memory_steps.append(
+                    f"--- after request {record['request']} ({record['traced_mb']} MB traced)\n"
+                    + "\n".join(str(stat) for stat in top if stat.size_diff)
+                )
+                self.last_snapshot = snapshot
+            self.records.append(record)
+
+            self.remaining -= 1
+            if self.remaining <= 0:
+                self._finish()
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+
+    def _sample_loop(self):
+        while not self.stop_sampling.wait(self.interval):
+            with self.lock:
+                idents = list(self.threads)
+            if not idents:
+                continue
+            frames = sys._current_frames()
+            for ident in idents:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    # Stop at our own wrapper: stacks start at answer() / answer_stream()
+                    if code.co_name in ('profiled', 'profiled_stream') and code.co_filename == __file__:
+                        break
+                    stack.append(_frame_name(code))
+                    frame = frame.f_back
+                if stack:
+                    self.samples[";".join(reversed(stack))] += 1
+
+    # -------------------------------------------------------------- output
+
+    def _finish(self):
+        """Unhook and write the run directory (called with self.lock held)"""
+        for method in PROFILED_METHODS:
+            self.rag.__dict__.pop(method, None)
+        self.stop_sampling.set()
+        self.active = False
+
+        if self.samples:
+            with open(os.path.join(self.run_dir, "cpu.collapsed"), 'w') as f:
+                for stack, count in self.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+        if self.stats is not None:
+            self.stats.dump_stats(os.path.join(self.run_dir, "cpu.pstats"))
+
+        summary = {
+            'mode': self.mode,
+            'requests': self.records,
+            'runtime': runtime_info()
+        }
+        if self.memory:
+            final = self._snapshot()
+            growth = final.compare_to(self.first_snapshot, 'lineno')[:25]
+            with open(os.path.join(self.run_dir, "memory.txt"), 'w') as f:
+                f.write(f"=== growth over {len(self.records)} requests (top 25 lines)\n")
+                f.write("\n".join(str(stat) for stat in growth) + "\n\n")
+                f.write("=== growth per request (top 5 lines each)\n")
+                f.write("\n".join(self.memory_steps) + "\n")
+            summary['memory_growth'] = [
+                {'where': str(stat.traceback[0]), 'size_diff_kb': round(stat.size_diff / 1024, 1),
+                 'count_diff': stat.count_diff}
+                for stat in growth[:10]
+            ]
+            self.first_snapshot = self.last_snapshot = None
+            if self.started_tracing:
+                tracemalloc.stop()
+
+        with open(os.path.join(self.run_dir, "summary.json"), 'w') as f:
+            json.dump(summary, f, indent=2)
+        self.last_run = self.run_dir
+        print(f"✅ Profile written: {self.run_dir} ({len(self.records)} requests)")
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Thin HTTP client for the retrieval service in 06_serve_api.py
+Mirrors the parts of RAGChatbotWithGoogle that app.py uses, so the UI can
+switch between an in-process model and a remote one with RAG_API_URL.
+"""
+
+import json
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+import requests
+
+
+class RemoteRAGClient:
+    """Talks to /answer, /answer/stream and /ready over a pooled session"""
+
+    def __init__(self, base_url: str, timeout: float = 60.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _post(self, path: str, payload: Dict, **kwargs) -> requests.Response:
+        resp = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout, **kwargs)
+        resp.raise_for_status()
+        return resp
+
+    def answer(self, query: str, k: int = 5, session: Optional[str] = None) -> Dict:
+        """Same result shape as RAGChatbotWithGoogle.answer()"""
+        result = self._post("/answer", {'query': query, 'k': k, 'session': session}).json()
+        result['programs'] = pd.DataFrame(result.get('programs') or [])
+        return result
+
+    def answer_stream(self, query: str, k: int = 5, session: Optional[str] = None) -> Iterator[Dict]:
+        """Yields the NDJSON events sent by /answer/stream"""
+        with self._post("/answer/stream", {'query': query, 'k': k, 'session': session}, stream=True) as resp:
+            for line in resp.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def suggest(self, prefix: str, n: int = 5) -> List[Dict]:
+        resp = self.session.get(f"{self.base_url}/suggest", params={'q': prefix, 'n': n}, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()['suggestions']
+
+    def stats(self) -> Dict:
+        resp = self.session.get(f"{self.base_url}/ready", timeout=self.timeout)
+        return resp.json()
+
+    def is_ready(self) -> bool:
+        try:
+            return bool(self.stats().get('ready'))
+        except requests.RequestException:
+            return False
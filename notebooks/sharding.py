@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SHARDED INDEX: WORKERS + SCATTER-GATHER COORDINATOR
+Serves the shards written by 03_faiss_index.build_sharded_index().
+
+    Shard worker  - loads one shard and answers search RPCs over
+                    multiprocessing.connection (TCP + authkey), so workers
+                    can be local processes or other hosts
+    ShardedIndex  - coordinator with the same search()/ntotal surface as a
+                    FAISS index: fans each query batch out to every shard,
+                    merges the per-shard top-k with a heap and returns
+                    partial results when a shard misses its deadline
+
+Workers unpickle requests, so the authkey is all that stands between an
+open port and arbitrary code: RAG_SHARD_AUTHKEY must be set (same value on
+the coordinator and every worker) and workers bind 127.0.0.1 by default.
+
+Run a worker on another host:
+    RAG_SHARD_AUTHKEY=<secret> python notebooks/sharding.py serve \
+        data/processed/shards/shard-002 --host 10.0.0.12 --port 7002
+
+Point the coordinator at remote workers (same order as manifest.json):
+    RAG_SHARD_ADDRESSES=host1:7000,host2:7001,...
+"""
+
+import argparse
+import heapq
+import json
+import multiprocessing as mp
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, Listener
+from queue import Empty, Queue
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+def shard_authkey() -> bytes:
+    """RAG_SHARD_AUTHKEY; there is deliberately no default"""
+    key = os.getenv('RAG_SHARD_AUTHKEY')
+    if not key:
+        raise RuntimeError("RAG_SHARD_AUTHKEY is not set: shard RPC unpickles requests and "
+                           "needs a private authkey shared by the coordinator and workers")
+    return key.encode('utf-8')
+
+
+def is_sharded(index_path: str) -> bool:
+    return os.path.isdir(index_path) and os.path.exists(os.path.join(index_path, "manifest.json"))
+
+
+# ============================================================================
+# WORKER
+# ============================================================================
+
+def _handle_connection(conn, index, ids: np.ndarray, manifest: Dict):
+    with conn:
+        while True:
+            try:
+                request = conn.recv()
+            except (EOFError, OSError):
+                return
+            command = request[0]
+            if command == 'search':
+                _, queries, k = request
+                distances, local = index.search(np.ascontiguousarray(queries, dtype='float32'), k)
+                # Map shard-local rows back to global ids, keeping -1 for "no result"
+                global_ids = np.where(local >= 0, ids[np.clip(local, 0, None)], -1)
+                conn.send((distances, global_ids))
+            elif command == 'info':
+                conn.send(manifest)
+            else:
+                conn.send(ValueError(f"unknown command {command!r}"))
+
+
+def serve_shard(shard_dir: str, host: str = '127.0.0.1', port: int = 0, ready=None):
+    """Load one shard and serve it forever; `ready` (a Pipe end) receives the bound address"""
+    authkey = shard_authkey()
+    with open(os.path.join(shard_dir, "manifest.json"), 'r') as f:
+        manifest = json.load(f)
+    index = faiss.read_index(os.path.join(shard_dir, manifest['index']))
+    ids = np.load(os.path.join(shard_dir, manifest['ids']), mmap_mode='r')
+
+    with Listener((host, port), backlog=64, authkey=authkey) as listener:
+        address = listener.address
+        if ready is not None:
+            ready.send(address)
+            ready.close()
+        else:
+            print(f"✅ shard-{manifest['shard']:03d} [{manifest['key']}] serving {manifest['count']:,} vectors on {address[0]}:{address[1]}")
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=_handle_connection, args=(conn, index, ids, manifest), daemon=True).start()
+
+
+def spawn_local_workers(shards_dir: str, host: str = '127.0.0.1') -> Tuple[List, List[Tuple[str, int]]]:
+    """Start one worker process per shard on this machine; returns (processes, addresses)"""
+    with open(os.path.join(shards_dir, "manifest.json"), 'r') as f:
+        manifest = json.load(f)
+
+    ctx = mp.get_context('spawn')
+    processes, pipes = [], []
+    for shard in manifest['shards']:
+        parent, child = ctx.Pipe(duplex=False)
+        process = ctx.Process(
+            target=serve_shard,
+            args=(os.path.join(shards_dir, shard['path']), host, 0, child),
+            daemon=True
+        )
+        process.start()
+        processes.append(process)
+        pipes.append(parent)
+    addresses = [pipe.recv() for pipe in pipes]
+    return processes, addresses
+
+
+# ============================================================================
+# COORDINATOR
+# ============================================================================
+
+class _ShardClient:
+    """Small connection pool to one shard worker; connections are not shared between threads"""
+
+    def __init__(self, address: Tuple[str, int]):
+        self.address = tuple(address)
+        self.authkey = shard_authkey()
+        self._idle: Queue = Queue()
+
+    def search(self, queries: np.ndarray, k: int, timeout: float):
+        try:
+            conn = self._idle.get_nowait()
+        except Empty:
+            conn = Client(self.address, authkey=self.authkey)
+        try:
+            conn.send(('search', queries, k))
+            if not conn.poll(timeout):
+                # The late reply would desync this connection, so drop it
+                conn.close()
+                raise TimeoutError(f"shard {self.address} timed out after {timeout:.2f}s")
+            result = conn.recv()
+        except Exception:
+            conn.close()
+            raise
+        self._idle.put(conn)
+        return result
+
+
+class ShardedIndex:
+    """
+    Scatter-gather search across shard workers.
+    Looks like a FAISS index to RAGChatbotWithGoogle (search, ntotal, d).
+    """
+
+    def __init__(self, shards_dir: str, addresses: Optional[List[Tuple[str, int]]] = None,
+                 timeout: float = 2.0, spawn_local: bool = True):
+        with open(os.path.join(shards_dir, "manifest.json"), 'r') as f:
+            self.manifest = json.load(f)
+        self.ntotal = self.manifest['ntotal']
+        self.d = self.manifest['dimension']
+        self.storage = self.manifest['storage']
+        self.timeout = timeout
+        self.processes = []
+        self.last_missing: List[int] = []
+        shard_authkey()  # fail before spawning workers that could not start either
+
+        if addresses is None:
+            env = os.getenv('RAG_SHARD_ADDRESSES')
+            if env:
+                addresses = [(host, int(port)) for host, port in (a.rsplit(':', 1) for a in env.split(','))]
+            elif spawn_local:
+                self.processes, addresses = spawn_local_workers(shards_dir)
+            else:
+                raise ValueError("No shard addresses given and spawn_local=False")
+        if len(addresses) != len(self.manifest['shards']):
+            raise ValueError(f"{len(addresses)} addresses for {len(self.manifest['shards'])} shards")
+
+        self.clients = [_ShardClient(address) for address in addresses]
+        self.pool = ThreadPoolExecutor(max_workers=len(self.clients) * 4, thread_name_prefix="shard")
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Same contract as faiss.Index.search. Shards that fail or miss the
+        deadline are skipped (listed in self.last_missing); missing slots are
+        padded with (inf, -1).
+        """
+        queries = np.ascontiguousarray(queries, dtype='float32')
+        deadline = time.monotonic() + self.timeout
+        futures = [self.pool.submit(client.search, queries, k, self.timeout) for client in self.clients]
+
+        results, missing = [], []
+        for shard_id, future in enumerate(futures):
+            try:
+                results.append(future.result(timeout=max(deadline - time.monotonic(), 0) + 0.05))
+            except Exception as e:
+                missing.append(shard_id)
+                print(f"⚠️ shard {shard_id} skipped: {type(e).__name__}: {e}")
+        self.last_missing = missing
+
+        distances = np.full((len(queries), k), np.inf, dtype='float32')
+        indices = np.full((len(queries), k), -1, dtype='int64')
+        for row in range(len(queries)):
+            candidates = (
+                (float(d), int(i))
+                for shard_d, shard_i in results
+                for d, i in zip(shard_d[row], shard_i[row]) if i >= 0
+            )
+            for col, (d, i) in enumerate(heapq.nsmallest(k, candidates)):
+                distances[row, col] = d
+                indices[row, col] = i
+        return distances, indices
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+        for process in self.processes:
+            process.terminate()
+
+
+# ============================================================================
+# TEST WITH LOCAL WORKER PROCESSES
+# ============================================================================
+
+def _self_test():
+    import importlib.util
+    import pickle
+    import tempfile
+    from pathlib import Path
+
+    # Throwaway key for the local workers (inherited through the environment)
+    os.environ.setdefault('RAG_SHARD_AUTHKEY', secrets.token_hex(16))
+    spec = importlib.util.spec_from_file_location("faiss_index", Path(__file__).parent / "03_faiss_index.py")
+    faiss_index = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(faiss_index)
+
+    print("="*80)
+    print("🧪 TESTING SHARDED SEARCH WITH LOCAL WORKERS")
+    print("="*80)
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((20_000, 64)).astype('float32')
+    queries = vectors[rng.integers(0, len(vectors), 32)] + 0.1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        embeddings_path = os.path.join(tmp, "embeddings.pkl")
+        with open(embeddings_path, 'wb') as f:
+            pickle.dump(vectors, f)
+        shards_dir = os.path.join(tmp, "shards")
+        faiss_index.build_sharded_index(embeddings_path, shards_dir, num_shards=4)
+
+        exact = faiss.IndexFlatL2(64)
+        exact.add(vectors)
+        _, expected = exact.search(queries, 10)
+
+        index = ShardedIndex(shards_dir, timeout=5.0)
+        try:
+            _, found = index.search(queries, 10)
+            assert np.array_equal(found, expected), "sharded results differ from a single flat index"
+            print(f"✅ 4 local workers match single-index results ({index.ntotal:,} vectors)")
+
+            index.processes[1].terminate()
+            index.processes[1].join()
+            _, partial = index.search(queries, 10)
+            assert index.last_missing == [1], index.last_missing
+            lo, hi = (int(x) for x in index.manifest['shards'][1]['key'].split('-'))
+            assert not ((partial >= lo) & (partial < hi)).any()
+            print(f"✅ dead shard skipped, partial results returned (missing {index.last_missing})")
+        finally:
+            index.close()
+
+    print("\n✅ SHARDED INDEX WORKING!")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shard workers for the sharded FAISS index")
+    sub = parser.add_subparsers(dest="command")
+    serve = sub.add_parser("serve", help="serve one shard directory")
+    serve.add_argument("shard_dir")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=7000)
+    sub.add_parser("test", help="run the local multi-process self-test")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve_shard(args.shard_dir, args.host, args.port)
+    else:
+        _self_test()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SHARED MODEL + INDEX SERVING FOR SEVERAL STREAMLIT WORKERS
+st.cache_resource caches per process, so N Streamlit processes behind a load
+balancer would each load the encoder, the catalogue and the index. Here:
+
+    export   - the loader step writes everything a worker needs as files
+               that can be memory-mapped read-only:
+                   catalogue.arrow   Arrow IPC, uncompressed (zero-copy)
+                   embeddings.npy    float32 matrix used for re-ranking
+                   faiss_index.bin   opened with IO_FLAG_MMAP_IFC
+                   facets.npz        built from the same catalogue, so
+                                     workers load it instead of rebuilding
+               The mapped pages live once in the OS page cache and every
+               worker maps the same ones. Each worker still builds its own
+               AutocompleteIndex and holds a copy of the (small) facet
+               arrays; bench_shared_serving.py counts both.
+    encoder  - one process holds the SentenceTransformer and serves encode()
+               to all workers over multiprocessing.connection, micro-batching
+               concurrent requests into one forward pass. Requests are
+               pickled, so RAG_ENCODER_AUTHKEY must be set (no default) on
+               the encoder and every worker.
+
+Flat / scalar-quantized codes are only mapped with faiss >= 1.11
+(IO_FLAG_MMAP_IFC, pinned in requirements.txt). Older faiss falls back to
+IO_FLAG_MMAP, which copies the codes into every worker's heap: ~330 MB
+private per worker instead of ~41 MB at 200k x 384-d, see
+bench_shared_serving.py.
+
+Usage:
+    python notebooks/shared_serving.py export
+    RAG_ENCODER_AUTHKEY=<secret> python notebooks/shared_serving.py encoder --port 7100
+    RAG_ENCODER_AUTHKEY=<secret> RAG_SHARED_DIR=./data/processed/shared RAG_ENCODER_ADDRESS=127.0.0.1:7100 \\
+        streamlit run app.py --server.port 8501     # repeat per worker port
+"""
+
+import argparse
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+from queue import Empty, Queue
+from typing import Dict, List, Tuple
+
+import faiss
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from facets import FacetIndex
+from sharding import is_sharded
+
+SHARED_DIR = "./data/processed/shared"
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Map flat / scalar-quantized codes instead of reading them into the heap
+# (faiss >= 1.11; older versions only mmap IVF lists and copy flat codes)
+MMAP_CODES = hasattr(faiss, 'IO_FLAG_MMAP_IFC')
+MMAP_FLAGS = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def encoder_authkey() -> bytes:
+    """RAG_ENCODER_AUTHKEY; there is deliberately no default"""
+    key = os.getenv('RAG_ENCODER_AUTHKEY')
+    if not key:
+        raise RuntimeError("RAG_ENCODER_AUTHKEY is not set: the encoder RPC unpickles requests and "
+                           "needs a private authkey shared by the encoder and workers")
+    return key.encode('utf-8')
+
+
+# ============================================================================
+# EXPORT (LOADER) / ATTACH (WORKERS)
+# ============================================================================
+
+def export_shared(data_path: str, embeddings_path: str, index_path: str,
+                  output_dir: str = SHARED_DIR) -> Dict:
+    """Write the memory-mappable copies workers attach to; returns the manifest"""
+
+    print("\n" + "="*80)
+    print(" EXPORT SHARED CATALOGUE / EMBEDDINGS / INDEX")
+    print("="*80 + "\n")
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    if data_path.endswith('.parquet'):
+        data = pd.read_parquet(data_path)
+    else:
+        try:
+            data = pd.read_csv(data_path, encoding='utf-8')
+        except UnicodeDecodeError:
+            data = pd.read_csv(data_path, encoding='latin-1')
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    with pa.OSFile(os.path.join(output_dir, "catalogue.arrow"), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    print(f" catalogue.arrow: {len(data):,} rows, {table.nbytes / 1e6:.1f} MB")
+
+    FacetIndex.build(data).save(os.path.join(output_dir, "facets.npz"))
+    print(f" facets.npz: {os.path.getsize(os.path.join(output_dir, 'facets.npz')) / 1e6:.1f} MB")
+
+    npy_path = os.path.splitext(embeddings_path)[0] + '.npy'
+    if os.path.exists(npy_path):
+        shutil.copyfile(npy_path, os.path.join(output_dir, "embeddings.npy"))
+        embeddings = np.load(npy_path, mmap_mode='r')
+    else:
+        with open(embeddings_path, 'rb') as f:
+            embeddings = np.asarray(pickle.load(f), dtype='float32')
+        np.save(os.path.join(output_dir, "embeddings.npy"), embeddings)
+    print(f" embeddings.npy: shape {embeddings.shape}")
+
+    # Shard workers already hold their own indexes; only point at them
+    if is_sharded(index_path):
+        index_file = os.path.abspath(index_path)
+    else:
+        index_file = "faiss_index.bin"
+        shutil.copyfile(index_path, os.path.join(output_dir, index_file))
+    print(f" index: {index_file}")
+
+    manifest = {
+        'rows': int(len(data)),
+        'dimension': int(embeddings.shape[1]),
+        'catalogue': "catalogue.arrow",
+        'embeddings': "embeddings.npy",
+        'facets': "facets.npz",
+        'index': index_file,
+        'created': time.time()
+    }
+    with open(os.path.join(output_dir, "manifest.json"), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"\n Saved to: {output_dir}")
+    return manifest
+
+
+def attach_shared(shared_dir: str) -> Tuple[pd.DataFrame, np.ndarray, str]:
+    """
+    Map an exported directory read-only
+    Returns (catalogue, embeddings, index_path); the catalogue columns are
+    Arrow-backed views of the mapped file, the embeddings a read-only memmap.
+    Open index_path with faiss.read_index(index_path, MMAP_FLAGS).
+    """
+    with open(os.path.join(shared_dir, "manifest.json"), 'r') as f:
+        manifest = json.load(f)
+    source = pa.memory_map(os.path.join(shared_dir, manifest['catalogue']), 'r')
+    data = pa.ipc.open_file(source).read_all().to_pandas(types_mapper=pd.ArrowDtype)
+    embeddings = np.load(os.path.join(shared_dir, manifest['embeddings']), mmap_mode='r')
+    index_path = os.path.join(shared_dir, manifest['index'])
+    if not MMAP_CODES:
+        print(f"⚠️ faiss {faiss.__version__} has no IO_FLAG_MMAP_IFC: flat index codes are copied "
+              f"into this process (needs faiss >= 1.11 to share them)")
+    return data, embeddings, index_path
+
+
+# ============================================================================
+# SHARED ENCODER
+# ============================================================================
+
+class EncodeBatcher:
+    """
+    Collects concurrent encode() requests from all workers and runs them as
+    one model call; flushed at `max_batch` texts or after `max_wait_ms`
+    """
+
+    def __init__(self, model, max_batch: int = 64, max_wait_ms: float = 5.0):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Queue = Queue()
+        self._thread = threading.Thread(target=self._run, name="encode-batcher", daemon=True)
+        self._thread.start()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        future: Future = Future()
+        self._queue.put((texts, future))
+        return future.result()
+
+    def _collect(self) -> List:
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+            size += len(batch[-1][0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for request, _ in batch for text in request]
+            try:
+                vectors = self.model.encode(texts, batch_size=self.max_batch, convert_to_numpy=True)
+                vectors = np.asarray(vectors, dtype='float32')
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            start = 0
+            for request, future in batch:
+                future.set_result(vectors[start:start + len(request)])
+                start += len(request)
+
+
+def _handle_encoder_connection(conn, batcher: EncodeBatcher, dimension: int):
+    with conn:
+        while True:
+            try:
+                request = conn.recv()
+            except (EOFError, OSError):
+                return
+            command = request[0]
+            try:
+                if command == 'encode':
+                    conn.send(batcher.encode(list(request[1])))
+                elif command == 'info':
+                    conn.send({'model': MODEL_NAME, 'dimension': dimension})
+                else:
+                    conn.send(ValueError(f"unknown command {command!r}"))
+            except Exception as e:
+                conn.send(e)
+
+
+def serve_encoder(host: str = '127.0.0.1', port: int = 7100, model=None,
+                  max_batch: int = 64, max_wait_ms: float = 5.0):
+    """Load the encoder once and serve encode() to local workers until interrupted"""
+    authkey = encoder_authkey()
+    if model is None:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(MODEL_NAME, device='cpu')
+    dimension = int(np.asarray(model.encode(["warmup"], convert_to_numpy=True)).shape[1])
+    batcher = EncodeBatcher(model, max_batch=max_batch, max_wait_ms=max_wait_ms)
+
+    with Listener((host, port), backlog=64, authkey=authkey) as listener:
+        print(f"✅ Shared encoder ({MODEL_NAME}, d={dimension}) on {host}:{listener.address[1]} "
+              f"(batch ≤{max_batch} / {max_wait_ms}ms)")
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=_handle_encoder_connection, args=(conn, batcher, dimension),
+                             daemon=True).start()
+
+
+class EncoderClient:
+    """
+    Drop-in for SentenceTransformer.encode() backed by the shared encoder
+    process; connections are pooled and never shared between threads
+    """
+
+    def __init__(self, address: str, timeout: float = 30.0):
+        host, port = address.rsplit(':', 1)
+        self.address = (host, int(port))
+        self.timeout = timeout
+        self.authkey = encoder_authkey()
+        self._idle: Queue = Queue()
+
+    def _call(self, request):
+        try:
+            conn = self._idle.get_nowait()
+        except Empty:
+            conn = Client(self.address, authkey=self.authkey)
+        try:
+            conn.send(request)
+            if not conn.poll(self.timeout):
+                conn.close()
+                raise TimeoutError(f"encoder {self.address} timed out after {self.timeout:.0f}s")
+            result = conn.recv()
+        except Exception:
+            conn.close()
+            raise
+        self._idle.put(conn)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def encode(self, sentences, batch_size: int = 64, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self._call(('encode', [sentences]))[0]
+        return self._call(('encode', list(sentences)))
+
+    def info(self) -> Dict:
+        return self._call(('info',))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared catalogue/index files and encoder for Streamlit workers")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="write the memory-mappable files workers attach to")
+    export.add_argument("--data", default="./data/processed/universities_data.csv")
+    export.add_argument("--embeddings", default="./data/processed/embeddings.pkl")
+    export.add_argument("--index", default=os.getenv("RAG_INDEX_PATH", "./data/processed/faiss_index.bin"))
+    export.add_argument("--output", default=SHARED_DIR)
+    encoder = sub.add_parser("encoder", help="serve the sentence encoder to local workers")
+    encoder.add_argument("--host", default="127.0.0.1")
+    encoder.add_argument("--port", type=int, default=7100)
+    encoder.add_argument("--max-batch", type=int, default=64)
+    encoder.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_shared(args.data, args.embeddings, args.index, args.output)
+    else:
+        serve_encoder(args.host, args.port, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
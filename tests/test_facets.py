@@ -0,0 +1,94 @@
+"""FacetIndex query planning and catalogue-wide answers"""
+
+import pandas as pd
+import pytest
+
+from facets import FAMILY_NAMES, LEVEL_NAMES, FacetIndex
+
+CATALOGUE = pd.DataFrame({
+    'program': [
+        'bachelor of engineering', 'b.e. civil engineering', 'msc computer science', 'ms data science',
+        'master of computer engineering', 'bsc physics', 'msc environmental science', 'ba english literature',
+        'master of business administration (mba)', 'post graduate diploma in management - pgdm', 'msc nursing',
+        'ba political science',
+    ],
+    'university_name': ['a', 'b', 'a', 'c', 'b', 'a', 'c', 'b', 'a', 'c', 'b', 'a'],
+    'fees': [9000, 400, 30000, 25000, 28000, 12000, 15000, 11000, 40000, 8000, 20000, 10000],
+    'ielts': [6.0, 5.5, 6.5, 6.5, 6.0, 6.0, 6.5, 7.0, 6.5, 5.5, 7.0, 6.5],
+    'toefl': [80, 70, 90, 90, 85, 80, 88, 100, 95, 70, 100, 90],
+})
+
+
+def family(name):
+    return FAMILY_NAMES.index(name)
+
+
+def level(name):
+    return LEVEL_NAMES.index(name)
+
+
+@pytest.fixture(scope="module")
+def facets():
+    return FacetIndex.build(CATALOGUE)
+
+
+@pytest.mark.parametrize("query, intent, families, levels", [
+    # Free text that catalogue-title patterns used to misread
+    ("Which programs would be the cheapest?", 'search', [], []),
+    ("cheapest computer science programs", 'search', ['computer science'], []),
+    ("cheapest data science programs", 'search', ['computer science'], []),
+    ("Compare computer science masters", 'comparison', ['computer science'], ['master']),
+    ("cheapest programs taught in english", 'search', [], []),
+    ("cheapest computer engineering programs", 'search', ['computer science'], []),
+    ("compare computer science and engineering", 'comparison', ['computer science', 'engineering'], []),
+    ("cheap programs in germany", 'search', [], []),
+    ("cheapest b.e. programs", 'search', ['engineering'], ['bachelor']),
+    # Sidebar examples
+    ("Cheap engineering programs", 'search', ['engineering'], []),
+    ("Best MBA programs", 'recommendation', ['business'], ['master']),
+    ("Compare CS masters", 'comparison', ['computer science'], ['master']),
+    ("Low IELTS requirements", 'search', [], []),
+    ("Under $10k universities", 'search', [], []),
+])
+def test_plan_families_and_levels(facets, query, intent, families, levels):
+    plan = facets.plan(query, intent)
+    assert plan is not None
+    assert plan['families'] == [family(name) for name in families]
+    assert plan['levels'] == [level(name) for name in levels]
+
+
+@pytest.mark.parametrize("query, sort, max_fees", [
+    ("Which programs would be the cheapest?", 'fees', None),
+    ("Cheap engineering programs", 'fees', None),
+    ("Low IELTS requirements", 'ielts', None),
+    ("Under $10k universities", 'fees', 10000.0),
+])
+def test_plan_sort_and_limits(facets, query, sort, max_fees):
+    plan = facets.plan(query, 'search')
+    assert plan['sort'] == sort
+    assert plan['max_fees'] == max_fees
+
+
+def test_plain_questions_fall_through_to_retrieval(facets):
+    assert facets.plan("Tell me about nursing in Australia", 'search') is None
+
+
+def test_cheapest_overall_ranks_whole_catalogue(facets):
+    facts = facets.describe(facets.plan("Which programs would be the cheapest?", 'search'), k=3)
+    assert facts['facts'].startswith(f"{len(CATALOGUE)} programs in the catalogue match (whole catalogue)")
+    assert list(CATALOGUE['fees'].iloc[facts['indices']]) == [400, 8000, 9000]
+
+
+def test_pg_diplomas_are_not_masters(facets):
+    plan = facets.plan("Compare business masters", 'comparison')
+    rows = CATALOGUE['program'][facets.mask(plan)].tolist()
+    assert rows == ['master of business administration (mba)']
+
+
+def test_several_families_without_comparison_describe_the_union(facets):
+    plan = facets.plan("cheapest nursing or business programs", 'search')
+    assert len(plan['families']) == 2
+    facts = facets.describe(plan, k=5)['facts'].splitlines()
+    matched = int(facts[0].split()[0])
+    assert matched == 3
+    assert f": {matched} programs at" in facts[1]
@@ -0,0 +1,57 @@
+"""Follow-up parsing: genuine follow-ups vs fresh questions that merely contain an ordinal or opener"""
+
+import pandas as pd
+import pytest
+
+from followups import is_followup, parse_duration_years, parse_ordinals, parse_refinement
+
+FRESH = [
+    "Top 10 engineering programs in Canada",
+    "What are the first steps to apply to a UK university?",
+    "What is the 2nd year curriculum of the MBA",
+    "Only masters programs in Germany",
+    "So which universities offer scholarships?",
+    "And nursing degrees in Australia",
+    "Compare CS masters",
+    "First class honours requirements for law",
+]
+
+
+@pytest.mark.parametrize("query", FRESH)
+def test_fresh_questions_are_not_followups(query):
+    assert not is_followup(query)
+    assert parse_ordinals(query, 5) is None
+
+
+@pytest.mark.parametrize("query, positions", [
+    ("compare the first two", [0, 1]),
+    ("tell me more about #2", [1]),
+    ("the last one", [4]),
+    ("both", [0, 1]),
+    ("how much does the second one cost", [1]),
+    ("last two", [3, 4]),
+])
+def test_ordinal_followups(query, positions):
+    assert is_followup(query)
+    assert parse_ordinals(query, 5) == positions
+
+
+@pytest.mark.parametrize("query", ["cheaper ones?", "and cheaper ones?", "the cheapest", "lower ielts"])
+def test_refinement_followups(query):
+    assert is_followup(query)
+    assert parse_ordinals(query, 5) is None
+    assert parse_refinement(query) is not None
+
+
+@pytest.mark.parametrize("query", ["what about in canada?", "and those with scholarships", "how about in the UK"])
+def test_explicit_references_keep_new_content(query):
+    # Answered by blending the new query vector with the previous turn's
+    assert is_followup(query)
+    assert parse_ordinals(query, 5) is None
+
+
+def test_duration_refinements_use_parsed_years():
+    assert parse_refinement("shorter ones")[:2] == ("duration_years", "lower")
+    years = parse_duration_years(pd.Series(["4 years", "18 month", "3 term", "6 semesters", None]))
+    assert years.round(2).tolist()[:4] == [4.0, 1.5, 1.0, 3.0]
+    assert pd.isna(years.iloc[4])
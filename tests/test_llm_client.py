@@ -0,0 +1,236 @@
+"""ResilientLLM against a stub provider and a local fake OpenAI-compatible server"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from llm_client import (CircuitBreaker, CircuitOpenError, LLMError, LLMProvider, ResilientLLM,
+                        is_retryable)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class ScriptedProvider(LLMProvider):
+    """Raises / yields whatever the test sets; counts calls"""
+
+    name = "scripted"
+
+    def __init__(self, error=None, chunks=("a", "b", "c")):
+        self.error = error
+        self.chunks = chunks
+        self.calls = 0
+
+    def generate(self, prompt, timeout):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return "".join(self.chunks)
+
+    def stream(self, prompt, timeout):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        yield from self.chunks
+
+
+def half_open_llm(provider, **kwargs):
+    """A client whose breaker is open and already past its reset timeout"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    return ResilientLLM(provider, backoff_base=0.01, breaker=breaker, **kwargs)
+
+
+# ============================================================================
+# BREAKER / RETRIES
+# ============================================================================
+
+def test_abandoned_stream_releases_half_open_trial():
+    llm = half_open_llm(ScriptedProvider())
+    stream = llm.stream("Programs: test")
+    assert next(stream) == "a"
+    stream.close()  # consumer stops reading mid-stream (GeneratorExit)
+
+    assert llm.breaker.state == "closed"
+    assert llm.generate("Programs: test") == "abc"
+
+
+def test_stream_abandoned_without_output_allows_new_trial():
+    class Silent(ScriptedProvider):
+        def stream(self, prompt, timeout):
+            self.calls += 1
+            time.sleep(0.01)
+            yield ""
+
+    llm = half_open_llm(Silent())
+    stream = llm.stream("Programs: test")
+    assert next(stream) == ""
+    stream.close()
+    assert llm.breaker.allow()
+
+
+def test_stream_slot_timeout_does_not_strand_half_open_trial():
+    llm = half_open_llm(ScriptedProvider(), max_concurrency=1)
+    llm.semaphore.acquire()  # every slot busy
+    with pytest.raises(LLMError):
+        list(llm.stream("Programs: test", timeout=0.05))
+    llm.semaphore.release()
+
+    assert llm.breaker.allow()
+
+
+def test_stream_fallback_shares_the_deadline():
+    class SlowThenBroken(ScriptedProvider):
+        def stream(self, prompt, timeout):
+            self.calls += 1
+            time.sleep(0.3)
+            raise StatusError(503)
+            yield
+
+        def generate(self, prompt, timeout):
+            self.calls += 1
+            time.sleep(min(timeout, 1.0))
+            raise TimeoutError("slow")
+
+    llm = ResilientLLM(SlowThenBroken(), max_retries=0, backoff_base=0.01)
+    start = time.monotonic()
+    with pytest.raises(LLMError):
+        list(llm.stream("Programs: test", timeout=0.5))
+    assert time.monotonic() - start < 0.8
+
+
+def test_client_errors_are_not_retried():
+    provider = ScriptedProvider(error=StatusError(400))
+    llm = ResilientLLM(provider, max_retries=3, backoff_base=0.01)
+    with pytest.raises(LLMError):
+        llm.generate("Programs: test")
+    assert provider.calls == 1
+
+
+def test_server_errors_are_retried():
+    provider = ScriptedProvider(error=StatusError(503))
+    llm = ResilientLLM(provider, max_retries=2, backoff_base=0.01)
+    with pytest.raises(LLMError):
+        llm.generate("Programs: test")
+    assert provider.calls == 3
+
+
+def test_stream_client_error_skips_generate_fallback():
+    provider = ScriptedProvider(error=StatusError(401))
+    llm = ResilientLLM(provider, max_retries=2, backoff_base=0.01)
+    with pytest.raises(LLMError):
+        list(llm.stream("Programs: test"))
+    assert provider.calls == 1
+
+
+@pytest.mark.parametrize("status, retryable", [(400, False), (401, False), (404, False),
+                                               (408, True), (429, True), (500, True), (None, True)])
+def test_is_retryable(status, retryable):
+    error = StatusError(status) if status else RuntimeError("boom")
+    assert is_retryable(error) is retryable
+
+
+# ============================================================================
+# FAKE OPENAI-COMPATIBLE SERVER
+# ============================================================================
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible /chat/completions whose behaviour is set per test"""
+
+    mode = "ok"
+    calls = 0
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        FakeOpenAIHandler.calls += 1
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.mode in ("fail", "bad-request"):
+            self.send_response(500 if self.mode == "fail" else 400)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.mode == "slow" or (self.mode == "slow-first" and FakeOpenAIHandler.calls == 1):
+            time.sleep(2.0)
+        body = json.dumps({
+            'id': 'fake', 'object': 'chat.completion', 'created': 0, 'model': 'fake',
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': 'ok'}}]
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    pytest.importorskip("openai")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+
+
+def run(base_url, mode, **kwargs):
+    from llm_client import OpenAIProvider
+
+    FakeOpenAIHandler.mode = mode
+    FakeOpenAIHandler.calls = 0
+    llm = ResilientLLM(OpenAIProvider("fake-key", "fake", base_url), backoff_base=0.05, **kwargs)
+    start = time.monotonic()
+    try:
+        outcome = llm.generate("Programs: test")
+    except LLMError as e:
+        outcome = type(e).__name__
+    return llm, outcome, time.monotonic() - start
+
+
+def test_healthy_call(base_url):
+    _, outcome, _ = run(base_url, "ok")
+    assert outcome == "ok"
+
+
+def test_slow_server_hits_deadline(base_url):
+    _, outcome, elapsed = run(base_url, "slow", timeout=0.5, max_retries=0)
+    assert outcome in ("LLMTimeoutError", "LLMError")
+    assert elapsed < 1.0
+
+
+def test_failing_server_is_retried_then_gives_up(base_url):
+    _, outcome, _ = run(base_url, "fail", timeout=2.0, max_retries=2)
+    assert outcome == "LLMError"
+    assert FakeOpenAIHandler.calls == 3
+
+
+def test_bad_request_is_not_retried(base_url):
+    _, outcome, _ = run(base_url, "bad-request", timeout=2.0, max_retries=2)
+    assert outcome == "LLMError"
+    assert FakeOpenAIHandler.calls == 1
+
+
+def test_circuit_opens_after_repeated_failures(base_url):
+    llm, _, _ = run(base_url, "fail", max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    with pytest.raises(LLMError):
+        llm.generate("Programs: test")
+    calls_before = FakeOpenAIHandler.calls
+    with pytest.raises(CircuitOpenError):
+        llm.generate("Programs: test")
+    assert FakeOpenAIHandler.calls == calls_before
+
+
+def test_hedged_request_beats_slow_primary(base_url):
+    _, outcome, elapsed = run(base_url, "slow-first", timeout=3.0, max_retries=0, hedge_after=0.2)
+    assert outcome == "ok"
+    assert elapsed < 1.0